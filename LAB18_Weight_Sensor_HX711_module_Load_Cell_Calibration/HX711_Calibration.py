@@ -0,0 +1,208 @@
+"""
+Multi-point HX711 load-cell calibration with temperature / time drift terms.
+
+Streams "Raw Value (Long): ..." lines from the calibration sketch, collects a
+stable block of readings for each reference weight you place on the scale and
+updates a least-squares model after every point:
+
+    grams = c0 + c1*r + c2*r^2 + c3*dT + c4*dT*r + c5*hours
+
+(r = raw / CALIBRATION_FACTOR, dT = temperature - T_REF). Terms without data
+are left out: the quadratic needs 3 weights, the temperature terms need the
+readings to span at least MIN_TEMP_SPAN, and the time drift needs one weight
+measured again later (e.g. finish the session with the empty platform). The
+fit is exported as a JSON coefficient file and a C header with a raw -> grams
+lookup table for the firmware.
+"""
+
+import json
+import re
+import sys
+import time
+import numpy as np
+
+# --- Configuration ---
+SERIAL_PORT = 'COM#'
+BAUD_RATE = 115200
+CALIBRATION_FACTOR = 50.4      # current single-point factor, used to scale raw values
+SAMPLES_PER_POINT = 30         # readings averaged per reference weight
+T_REF = 25.0                   # deg C, temperature the offsets refer to
+MIN_TEMP_SPAN = 1.0            # deg C needed before fitting temperature terms
+TABLE_SIZE = 32                # lookup-table entries exported to the firmware
+OUTPUT_JSON = "hx711_calibration.json"
+OUTPUT_HEADER = "hx711_calibration.h"
+# ---------------------
+
+TERMS = ["offset", "gain", "quadratic", "temp_offset", "temp_gain", "drift_per_hour"]
+# The fit uses r^2 / 1000 as the quadratic column to keep X'X well conditioned;
+# reported coefficients are multiplied by this to match the formula above
+TERM_SCALE = np.array([1.0, 1.0, 1e-3, 1.0, 1.0, 1.0])
+LINE_RE = re.compile(rb"Raw Value \(Long\):\s*(-?\d+)(?:.*?Temp(?:erature)?[^:]*:\s*(-?[\d.]+))?")
+
+
+def design_matrix(raw, temp=None, hours=None):
+    """All candidate terms as columns (quadratic scaled by 1/1000); rows are readings."""
+    r = np.asarray(raw, dtype=np.float64) / CALIBRATION_FACTOR
+    dT = np.zeros_like(r) if temp is None else np.asarray(temp, dtype=np.float64) - T_REF
+    h = np.zeros_like(r) if hours is None else np.asarray(hours, dtype=np.float64)
+    return np.column_stack([np.ones_like(r), r, r * r / 1000.0, dT, dT * r, h])
+
+
+class IncrementalFit:
+    """Least squares from accumulated normal equations.
+
+    add() folds a block of readings into X'X and X'y (O(terms^2) memory,
+    regardless of how many readings were streamed); solve() is cheap and can
+    run after every reference point.
+    """
+
+    def __init__(self, n_terms=len(TERMS)):
+        self.xtx = np.zeros((n_terms, n_terms))
+        self.xty = np.zeros(n_terms)
+        self.yty = 0.0
+        self.n = 0
+        self.points = 0
+        self.temp_span = [np.inf, -np.inf]
+        self.refs = []
+        self.coef = np.zeros(n_terms)
+
+    def add(self, X, y):
+        """Fold in a block of readings; rows with a missing (NaN) value are skipped."""
+        X = np.atleast_2d(X)
+        y = np.atleast_1d(np.asarray(y, dtype=np.float64))
+        keep = np.isfinite(X).all(axis=1) & np.isfinite(y)
+        X, y = X[keep], y[keep]
+        if not len(y):
+            return 0
+        self.xtx += X.T @ X
+        self.xty += X.T @ y
+        self.yty += float(y @ y)
+        self.n += len(y)
+        self.points += 1
+        self.temp_span = [min(self.temp_span[0], X[:, 3].min()), max(self.temp_span[1], X[:, 3].max())]
+        self.refs.append(float(np.mean(y)))
+        return len(y)
+
+    def active_terms(self):
+        """Terms that can be identified with the reference points so far."""
+        distinct = len(set(self.refs))
+        active = np.ones(len(self.coef), dtype=bool)
+        active[1] = distinct >= 2
+        active[2] = distinct >= 3
+        active[3:5] = self.temp_span[1] - self.temp_span[0] >= MIN_TEMP_SPAN
+        active[5] = distinct < self.points   # a repeated weight exposes drift
+        return active
+
+    def solve(self):
+        active = self.active_terms()
+        coef = np.zeros_like(self.coef)
+        a = self.xtx[np.ix_(active, active)]
+        coef[active] = np.linalg.lstsq(a, self.xty[active], rcond=None)[0]
+        self.coef = coef
+        return coef
+
+    def rms_residual(self):
+        c = self.coef
+        sse = self.yty - 2 * c @ self.xty + c @ self.xtx @ c
+        return float(np.sqrt(max(sse, 0.0) / max(self.n, 1)))
+
+
+def predict(coef, raw, temp=None, hours=None):
+    return design_matrix(raw, temp, hours) @ coef
+
+
+def coefficients(coef):
+    """{term: c} for grams = c0 + c1*r + c2*r^2 + ... (fit coefficients unscaled)."""
+    return dict(zip(TERMS, (coef * TERM_SCALE).tolist()))
+
+
+def lookup_table(coef, raw_min, raw_max, size=TABLE_SIZE):
+    """Raw -> grams at T_REF and zero drift, evenly spaced over the calibrated range."""
+    raw = np.linspace(raw_min, raw_max, size)
+    return raw, predict(coef, raw)
+
+
+def export(fit, raw_min, raw_max, json_path=OUTPUT_JSON, header_path=OUTPUT_HEADER):
+    coef = fit.coef
+    with open(json_path, "w") as f:
+        json.dump({
+            "calibration_factor": CALIBRATION_FACTOR,
+            "t_ref": T_REF,
+            "terms": coefficients(coef),
+            "points": fit.points,
+            "readings": fit.n,
+            "rms_residual_g": fit.rms_residual(),
+        }, f, indent=2)
+
+    raw, grams = lookup_table(coef, raw_min, raw_max)
+    with open(header_path, "w") as f:
+        f.write("// Generated by HX711_Calibration.py - piecewise-linear raw -> grams\n")
+        f.write(f"#define CAL_TABLE_SIZE {len(raw)}\n")
+        f.write("const long CAL_RAW[CAL_TABLE_SIZE] = {" + ", ".join(f"{int(round(v))}" for v in raw) + "};\n")
+        f.write("const float CAL_GRAMS[CAL_TABLE_SIZE] = {" + ", ".join(f"{v:.3f}f" for v in grams) + "};\n")
+        f.write(f"const float CAL_T_REF = {T_REF:.2f}f;\n")
+        f.write(f"const float CAL_TEMP_OFFSET = {coef[3]:.6f}f;      // g per deg C\n")
+        f.write(f"const float CAL_TEMP_GAIN = {coef[4] / CALIBRATION_FACTOR:.9f}f; // g per deg C per raw count\n")
+        f.write(f"const float CAL_DRIFT_PER_HOUR = {coef[5]:.6f}f;   // g per hour since tare\n")
+
+
+def read_point(ser, count=SAMPLES_PER_POINT, t0=None):
+    """Collect `count` parsed readings; returns (raw, temp or None, hours)."""
+    raw, temp, hours = [], [], []
+    pending = b''
+    t0 = time.monotonic() if t0 is None else t0
+    while len(raw) < count:
+        pending += ser.read(max(ser.in_waiting, 1))
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            m = LINE_RE.search(line)
+            if m:
+                raw.append(int(m.group(1)))
+                temp.append(float(m.group(2)) if m.group(2) else np.nan)
+                hours.append((time.monotonic() - t0) / 3600.0)
+    temp = np.array(temp[:count])
+    return np.array(raw[:count]), (None if np.isnan(temp).all() else temp), np.array(hours[:count])
+
+
+def main():
+    import serial
+    ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=0.1)
+    fit = IncrementalFit()
+    raw_seen = []
+    t0 = time.monotonic()
+    print("Multi-point calibration. Tare with the empty platform first (enter 0).")
+    try:
+        while True:
+            entry = input("Reference weight in g (empty to finish): ").strip()
+            if not entry:
+                break
+            try:
+                ref_g = float(entry)
+            except ValueError:
+                print(f"  '{entry}' is not a weight in grams, try again.")
+                continue
+            ser.reset_input_buffer()
+            raw, temp, hours = read_point(ser, t0=t0)
+            if not fit.add(design_matrix(raw, temp, hours), np.full(len(raw), ref_g)):
+                print("  no usable readings for this point, measure it again.")
+                continue
+            raw_seen.extend([raw.min(), raw.max()])
+            coef = fit.solve()
+            spread = np.std(raw) / CALIBRATION_FACTOR
+            print(f"  point {fit.points}: raw mean {raw.mean():.0f} (+/- {spread:.2f} g) | "
+                  f"rms residual {fit.rms_residual():.3f} g | "
+                  + " ".join(f"{k}={v:.4g}" for (k, v), a in zip(coefficients(coef).items(), fit.active_terms()) if a))
+    except KeyboardInterrupt:
+        print()
+    finally:
+        ser.close()
+
+    if fit.points < 2:
+        print("Need at least 2 reference weights.")
+        sys.exit(1)
+    export(fit, min(raw_seen), max(raw_seen))
+    print(f"Saved {OUTPUT_JSON} and {OUTPUT_HEADER}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Host-side emulator of the LAB20 sensor-fusion state machine.
+
+Replays HX711 / APDS-9960 traces through the same IDLE -> WEIGHT_READING ->
+WAIT_FOR_MOVE -> COLOR_READING -> DECISION_READY logic as the firmware, one
+loop() iteration (100 ms on the ESP32) per trace sample. All traces advance
+together as NumPy arrays, so thousands of objects replay in one pass.
+Every parameter may also be an array (one value per trace), which is how the
+threshold search evaluates many settings at once.
+"""
+
+import numpy as np
+
+# --- Firmware constants (Sensor_Fusion_by_using_HX711_and_APDS-9960_Modules.py) ---
+DEFAULT_PARAMS = {
+    "WEIGHT_THRESHOLD": 2.0,
+    "PROXIMITY_COLOR_THRESHOLD": 50,
+    "CLASSIFY_WEIGHT_THRESHOLD": 50.0,
+    "RED_RATIO_THRESHOLD": 1.2,
+    "WEIGHT_STABILITY_COUNT": 15,
+    "COLOR_STABILITY_COUNT": 25,
+    "COLOR_BURN_IN_COUNT": 5,
+    "RESET_PROXIMITY": 30,
+    "RESET_WEIGHT": 1.0,
+    # False reproduces the firmware as written: loop() re-reads the sensor
+    # before DECISION_READY runs, so the live reading is classified, not the
+    # 25-sample average. True classifies the locked average instead.
+    "CLASSIFY_ON_AVERAGE": False,
+    # Adaptive stabilization: lock early once the standard error of the
+    # running mean is within tolerance; *_STABILITY_COUNT stays the maximum
+    "ADAPTIVE_STABILIZATION": False,
+    "WEIGHT_MIN_COUNT": 5,
+    "WEIGHT_SE_TOLERANCE": 0.05,
+    "COLOR_MIN_COUNT": 5,
+    "COLOR_SE_TOLERANCE": 2.0,
+}
+LOOP_PERIOD = 0.1   # s, delay(100) at the end of loop()
+
+# States (enum TestState)
+STATE_IDLE = 0
+STATE_WEIGHT_READING = 1
+STATE_WAIT_FOR_MOVE = 2
+STATE_COLOR_READING = 3
+STATE_DECISION_READY = 4
+
+# Classification results
+PENDING = 0
+CLASS_A = 1   # Heavy
+CLASS_B = 2   # Light Red
+CLASS_C = 3   # Light Other
+CLASS_NAMES = {PENDING: "PENDING", CLASS_A: "CLASS A (Heavy)",
+               CLASS_B: "CLASS B (Light Red)", CLASS_C: "CLASS C (Light Other)"}
+
+
+def _param(params, name, n):
+    value = np.asarray(params.get(name, DEFAULT_PARAMS[name]))
+    return np.broadcast_to(value, (n,))
+
+
+class RunningStats:
+    """Welford running mean/variance for `channels` values per trace.
+
+    Mirrors the firmware's RunningStats struct; the weight uses one channel,
+    the colour reading three (R, G, B) that share one sample count.
+    """
+
+    def __init__(self, channels, n):
+        self.count = np.zeros(n, dtype=np.int64)
+        self.mean = np.zeros((channels, n))
+        self.m2 = np.zeros((channels, n))
+
+    def reset(self, mask):
+        self.count[mask] = 0
+        self.mean[:, mask] = 0.0
+        self.m2[:, mask] = 0.0
+
+    def add(self, mask, x):
+        self.count[mask] += 1
+        delta = x[:, mask] - self.mean[:, mask]
+        self.mean[:, mask] += delta / self.count[mask]
+        self.m2[:, mask] += delta * (x[:, mask] - self.mean[:, mask])
+
+    def standard_error(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            se = np.sqrt(self.m2 / (self.count - 1) / self.count)
+        return np.where(self.count >= 2, se, np.inf)
+
+    def settled(self, min_count, max_count, tolerance, adaptive):
+        """Trace mask: max count reached, or (adaptive) every channel within tolerance."""
+        early = (self.count >= min_count) & (self.standard_error() <= tolerance).all(axis=0)
+        return (self.count >= max_count) | (adaptive & early)
+
+
+def run_state_machine(weight, proximity, red, green, blue, params=None):
+    """Replay traces shaped (n_traces, n_loops) through the firmware logic.
+
+    weight is in grams (LoadCell.getData() / CALIBRATION_FACTOR); NaN means
+    LoadCell.update() had no new value, so the previous weight is kept.
+    Returns a dict of decision events, one entry per classified object:
+    trace, loop, cls, weight, red, green, blue, cycle_loops (first weight
+    above threshold -> decision) and hold_loops (loops the object actually
+    had to sit on the scale plus at the colour sensor, i.e. the part of the
+    cycle set by the stabilization counts rather than by the operator).
+    """
+    params = params or {}
+    weight = np.asarray(weight, dtype=np.float64)
+    proximity = np.asarray(proximity)
+    red, green, blue = (np.asarray(c, dtype=np.int64) for c in (red, green, blue))
+    n, n_loops = weight.shape
+
+    w_th = _param(params, "WEIGHT_THRESHOLD", n)
+    p_th = _param(params, "PROXIMITY_COLOR_THRESHOLD", n)
+    cw_th = _param(params, "CLASSIFY_WEIGHT_THRESHOLD", n)
+    ratio = _param(params, "RED_RATIO_THRESHOLD", n)
+    w_count = _param(params, "WEIGHT_STABILITY_COUNT", n)
+    c_count = _param(params, "COLOR_STABILITY_COUNT", n)
+    burn_count = _param(params, "COLOR_BURN_IN_COUNT", n)
+    reset_p = _param(params, "RESET_PROXIMITY", n)
+    reset_w = _param(params, "RESET_WEIGHT", n)
+    on_average = bool(params.get("CLASSIFY_ON_AVERAGE", DEFAULT_PARAMS["CLASSIFY_ON_AVERAGE"]))
+    adaptive = _param(params, "ADAPTIVE_STABILIZATION", n).astype(bool)
+    w_min = _param(params, "WEIGHT_MIN_COUNT", n)
+    w_tol = _param(params, "WEIGHT_SE_TOLERANCE", n)
+    c_min = _param(params, "COLOR_MIN_COUNT", n)
+    c_tol = _param(params, "COLOR_SE_TOLERANCE", n)
+
+    state = np.full(n, STATE_IDLE, dtype=np.int8)
+    current_weight = np.zeros(n)
+    weight_stats = RunningStats(1, n)
+    final_weight = np.zeros(n)
+    rgb_stats = RunningStats(3, n)
+    final_rgb = np.zeros((3, n), dtype=np.int64)
+    burn_in = np.zeros(n, dtype=np.int64)
+    burn_done = np.zeros(n, dtype=bool)
+    result = np.full(n, PENDING, dtype=np.int8)
+    cycle_start = np.zeros(n, dtype=np.int64)
+    weight_loops = np.zeros(n, dtype=np.int64)
+    color_start = np.zeros(n, dtype=np.int64)
+    events = {k: [] for k in ("trace", "loop", "cls", "weight", "red", "green", "blue",
+                              "cycle_loops", "hold_loops")}
+
+    for t in range(n_loops):
+        # 1. Read all sensor data
+        w_new = weight[:, t]
+        has_w = ~np.isnan(w_new)
+        current_weight[has_w] = w_new[has_w]
+        p = proximity[:, t]
+        rgb = np.stack([red[:, t], green[:, t], blue[:, t]])
+        heavy = current_weight > w_th
+        near = p > p_th
+
+        # Masks are taken before any transition so each trace moves at most
+        # one state per loop, exactly like the switch statement
+        idle = state == STATE_IDLE
+        reading_w = state == STATE_WEIGHT_READING
+        waiting = state == STATE_WAIT_FOR_MOVE
+        reading_c = state == STATE_COLOR_READING
+        deciding = state == STATE_DECISION_READY
+
+        # STATE_IDLE
+        start = idle & heavy
+        weight_stats.reset(start)
+        result[start] = PENDING
+        cycle_start[start] = t
+        state[start] = STATE_WEIGHT_READING
+
+        # STATE_WEIGHT_READING
+        acc = reading_w & heavy
+        weight_stats.add(acc, current_weight[None])
+        locked = acc & weight_stats.settled(w_min, w_count, w_tol, adaptive)
+        final_weight[locked] = weight_stats.mean[0, locked]
+        weight_loops[locked] = t - cycle_start[locked] + 1
+        state[locked] = STATE_WAIT_FOR_MOVE
+        state[reading_w & ~heavy] = STATE_IDLE
+
+        # STATE_WAIT_FOR_MOVE
+        arrive = waiting & near
+        rgb_stats.reset(arrive)
+        burn_done[arrive] = False
+        burn_in[arrive] = 0
+        color_start[arrive] = t
+        state[arrive] = STATE_COLOR_READING
+
+        # STATE_COLOR_READING
+        present = reading_c & near
+        burning = present & ~burn_done
+        burn_in[burning] += 1
+        burn_done[burning & (burn_in >= burn_count)] = True
+        averaging = present & ~burning
+        rgb_stats.add(averaging, rgb)
+        c_locked = averaging & rgb_stats.settled(c_min, c_count, c_tol, adaptive)
+        final_rgb[:, c_locked] = np.floor(rgb_stats.mean[:, c_locked])   # (uint16_t)mean truncates
+        state[c_locked] = STATE_DECISION_READY
+        state[reading_c & ~near] = STATE_WAIT_FOR_MOVE
+
+        # STATE_DECISION_READY (see CLASSIFY_ON_AVERAGE)
+        classify = deciding & (result == PENDING)
+        if classify.any():
+            r, g, b = (final_rgb if on_average else rgb)[:, classify]
+            cls = np.where(final_weight[classify] >= cw_th[classify], CLASS_A,
+                           np.where((r > g * ratio[classify]) & (r > b), CLASS_B, CLASS_C))
+            result[classify] = cls
+            idx = np.flatnonzero(classify)
+            events["trace"].append(idx)
+            events["loop"].append(np.full(len(idx), t))
+            events["cls"].append(cls)
+            events["weight"].append(final_weight[classify].copy())
+            for name, channel in zip(("red", "green", "blue"), (r, g, b)):
+                events[name].append(channel)
+            events["cycle_loops"].append(t - cycle_start[classify])
+            events["hold_loops"].append(weight_loops[classify] + t - color_start[classify])
+
+        removed = deciding & (p < reset_p) & (current_weight < reset_w)
+        state[removed] = STATE_IDLE
+        final_weight[removed] = 0.0
+        result[removed] = PENDING
+
+    return {k: np.concatenate(v) if v else np.empty(0) for k, v in events.items()}
+
+
+def synthetic_traces(n_objects, rng=None, weights=None, colors=None, noise=0.5):
+    """Generate one object pass per trace: scale, move to colour station, remove.
+
+    weights: grams per object; colors: (n, 3) mean RGB per object. Returns
+    (weight, proximity, red, green, blue) arrays and the ground-truth class.
+    """
+    rng = rng or np.random.default_rng()
+    if weights is None:
+        weights = rng.uniform(5, 100, n_objects)
+    if colors is None:
+        colors = rng.uniform(50, 400, (n_objects, 3))
+    weights = np.asarray(weights, dtype=np.float64)
+    colors = np.asarray(colors, dtype=np.float64)
+
+    on_scale, move, at_color, gone = 40, 10, 60, 20
+    n_loops = 5 + on_scale + move + at_color + gone
+    t = np.arange(n_loops)
+    scale_on = (t >= 5) & (t < 5 + on_scale)
+    color_on = (t >= 5 + on_scale + move) & (t < 5 + on_scale + move + at_color)
+
+    # Weight settles with a first-order response after placement
+    settle = 1 - np.exp(-(t - 5).clip(0) / 2.0)
+    weight = np.where(scale_on, weights[:, None] * settle, 0.0)
+    weight += rng.normal(0, noise, weight.shape)
+    proximity = np.where(color_on, 200, 5) + rng.integers(-3, 4, (n_objects, n_loops))
+
+    # Colour readings ramp up as the object enters the sensor field
+    ramp = np.clip((t - (5 + on_scale + move)) / 3.0, 0, 1) * color_on
+    rgb = [np.clip(colors[:, i, None] * ramp + rng.normal(0, 5, (n_objects, n_loops)), 0, 65535).astype(np.int64)
+           for i in range(3)]
+
+    truth = np.where(weights >= DEFAULT_PARAMS["CLASSIFY_WEIGHT_THRESHOLD"], CLASS_A,
+                     np.where((colors[:, 0] > colors[:, 1] * DEFAULT_PARAMS["RED_RATIO_THRESHOLD"])
+                              & (colors[:, 0] > colors[:, 2]), CLASS_B, CLASS_C))
+    return (weight, proximity, *rgb), truth
+
+
+def main():
+    rng = np.random.default_rng(0)
+    (weight, proximity, red, green, blue), truth = synthetic_traces(10000, rng)
+    events = run_state_machine(weight, proximity, red, green, blue)
+    correct = np.mean(events["cls"] == truth[events["trace"]]) * 100
+    hold_s = np.mean(events["hold_loops"]) * LOOP_PERIOD
+    print(f"Objects: {len(truth)} | Classified: {len(events['cls'])} | Accuracy: {correct:.1f}% | "
+          f"Mean stabilization time: {hold_s:.2f}s")
+    for cls, name in CLASS_NAMES.items():
+        if cls != PENDING:
+            print(f"  {name}: {np.sum(events['cls'] == cls)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -52,14 +52,9 @@ const float RED_RATIO_THRESHOLD = 1.2;
 
 
 // --- Data Stability Variables (Core) ---
-float weightAccumulator = 0.0;
 int weightReadingsTaken = 0;
 const int WEIGHT_STABILITY_COUNT = 15; 
 
-uint32_t redAccumulator = 0;
-uint32_t greenAccumulator = 0;
-uint32_t blueAccumulator = 0;
-
 int colorReadingsTaken = 0;
 const int COLOR_STABILITY_COUNT = 25; 
 const int COLOR_BURN_IN_COUNT = 5;    
@@ -67,6 +62,46 @@ const int COLOR_BURN_IN_COUNT = 5;
 bool colorBurnInComplete = false;
 int burnInCounter = 0;
 
+// --- Adaptive Stabilization (early exit) ---
+// When enabled, averaging stops as soon as the standard error of the running
+// mean is below the tolerance (after a minimum count). The *_STABILITY_COUNT
+// constants above remain the hard maximum.
+const bool ADAPTIVE_STABILIZATION = false;
+const int WEIGHT_MIN_COUNT = 5;
+const float WEIGHT_SE_TOLERANCE = 0.05;   // g
+const int COLOR_MIN_COUNT = 5;
+const float COLOR_SE_TOLERANCE = 2.0;     // raw APDS-9960 counts
+
+// Welford running mean/variance, shared by the weight and R/G/B channels
+struct RunningStats {
+  int n = 0;
+  float mean = 0.0;
+  float m2 = 0.0;
+
+  void reset() { n = 0; mean = 0.0; m2 = 0.0; }
+
+  void add(float x) {
+    n++;
+    float delta = x - mean;
+    mean += delta / n;
+    m2 += delta * (x - mean);
+  }
+
+  // Standard error of the mean; "infinite" until there are 2 samples
+  float standardError() const {
+    if (n < 2) return 1e30;
+    return sqrt(m2 / (n - 1) / n);
+  }
+};
+
+RunningStats weightStats;
+RunningStats redStats, greenStats, blueStats;
+
+bool isSettled(const RunningStats &s, int minCount, int maxCount, float tolerance) {
+  if (s.n >= maxCount) return true;
+  return ADAPTIVE_STABILIZATION && s.n >= minCount && s.standardError() <= tolerance;
+}
+
 
 // ====================================================================
 
@@ -132,8 +167,8 @@ void loop() {
     
     case STATE_IDLE:
       if (currentWeight > WEIGHT_THRESHOLD) {
-        weightAccumulator = 0.0;
         weightReadingsTaken = 0;
+        weightStats.reset();
         classificationResult = "PENDING"; 
         currentState = STATE_WEIGHT_READING;
         Serial.println("-> State Change: WEIGHT_READING (Object detected, starting stabilization).");
@@ -142,15 +177,14 @@ void loop() {
 
     case STATE_WEIGHT_READING:
       if (currentWeight > WEIGHT_THRESHOLD) {
-        weightAccumulator += currentWeight;
         weightReadingsTaken++;
+        weightStats.add(currentWeight);
         
-        if (weightReadingsTaken >= WEIGHT_STABILITY_COUNT) {
-            finalWeight = weightAccumulator / WEIGHT_STABILITY_COUNT;
+        if (isSettled(weightStats, WEIGHT_MIN_COUNT, WEIGHT_STABILITY_COUNT, WEIGHT_SE_TOLERANCE)) {
+            finalWeight = weightStats.mean;
             
-            Serial.printf("-> Weight Locked (Avg. of %d): %.2fg. Please move object to the Color Station.\n", WEIGHT_STABILITY_COUNT, finalWeight);
+            Serial.printf("-> Weight Locked (Avg. of %d): %.2fg. Please move object to the Color Station.\n", weightReadingsTaken, finalWeight);
             
-            weightAccumulator = 0.0;
             weightReadingsTaken = 0;
 
             currentState = STATE_WAIT_FOR_MOVE;
@@ -163,7 +197,7 @@ void loop() {
 
     case STATE_WAIT_FOR_MOVE:
       if (proximity_value > PROXIMITY_COLOR_THRESHOLD) {
-        redAccumulator = 0; greenAccumulator = 0; blueAccumulator = 0;
+        redStats.reset(); greenStats.reset(); blueStats.reset();
         colorReadingsTaken = 0;
         colorBurnInComplete = false;
         burnInCounter = 0;
@@ -186,22 +220,22 @@ void loop() {
           }
           
         } else {
-          redAccumulator += red_light;
-          greenAccumulator += green_light;
-          blueAccumulator += blue_light;
           colorReadingsTaken++;
+          redStats.add(red_light); greenStats.add(green_light); blueStats.add(blue_light);
 
-          if (colorReadingsTaken >= COLOR_STABILITY_COUNT) {
-              uint16_t finalRed = redAccumulator / COLOR_STABILITY_COUNT;
-              uint16_t finalGreen = greenAccumulator / COLOR_STABILITY_COUNT;
-              uint16_t finalBlue = blueAccumulator / COLOR_STABILITY_COUNT;
+          if (isSettled(redStats, COLOR_MIN_COUNT, COLOR_STABILITY_COUNT, COLOR_SE_TOLERANCE) &&
+              isSettled(greenStats, COLOR_MIN_COUNT, COLOR_STABILITY_COUNT, COLOR_SE_TOLERANCE) &&
+              isSettled(blueStats, COLOR_MIN_COUNT, COLOR_STABILITY_COUNT, COLOR_SE_TOLERANCE)) {
+              uint16_t finalRed = (uint16_t)redStats.mean;
+              uint16_t finalGreen = (uint16_t)greenStats.mean;
+              uint16_t finalBlue = (uint16_t)blueStats.mean;
 
               // Write the average values to the global variables (red_light, green_light, blue_light)
               red_light = finalRed;
               green_light = finalGreen;
               blue_light = finalBlue;
 
-              Serial.printf("\n-> Color Locked (Avg. of %d): R:%d, G:%d, B:%d. Data Collection Complete.\n", COLOR_STABILITY_COUNT, finalRed, finalGreen, finalBlue);
+              Serial.printf("\n-> Color Locked (Avg. of %d): R:%d, G:%d, B:%d. Data Collection Complete.\n", colorReadingsTaken, finalRed, finalGreen, finalBlue);
               Serial.println("\n--- CLASSIFICATION DATA READY ---");
               Serial.printf("FINAL DATA: Weight=%.2fg, R=%d, G=%d, B=%d\n", finalWeight, red_light, green_light, blue_light);
 
@@ -0,0 +1,125 @@
+"""
+Grid search over the LAB20 thresholds and stabilization counts.
+
+Each parameter combination is scored on labeled traces with the emulator:
+accuracy (unclassified objects count as wrong) against objects per minute,
+and the Pareto frontier of the two is reported. Combinations are evaluated
+by tiling the traces and passing per-trace parameter arrays, so one emulator
+pass scores a whole batch of settings; batches run in parallel processes.
+"""
+
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from Sensor_Fusion_Emulator import DEFAULT_PARAMS, LOOP_PERIOD, run_state_machine, synthetic_traces
+
+# --- Search configuration ---
+GRID = {
+    "WEIGHT_THRESHOLD": [2.0],
+    "PROXIMITY_COLOR_THRESHOLD": [50],
+    "CLASSIFY_WEIGHT_THRESHOLD": [45.0, 50.0, 55.0],
+    "RED_RATIO_THRESHOLD": [1.1, 1.2, 1.3],
+    "WEIGHT_STABILITY_COUNT": [3, 5, 8, 10, 15],
+    "COLOR_BURN_IN_COUNT": [1, 3, 5],
+    "COLOR_STABILITY_COUNT": [3, 5, 10, 15, 25],
+}
+HANDLING_TIME = 2.0     # s per object spent moving it (operator / conveyor)
+MAX_BATCH = 200000      # traces per emulator pass (memory bound)
+WORKERS = os.cpu_count() or 1
+# ----------------------------
+
+
+def load_recording(path):
+    """Labeled recording: .npz with weight, proximity, red, green, blue (objects x loops) and label."""
+    data = np.load(path)
+    traces = tuple(data[k] for k in ("weight", "proximity", "red", "green", "blue"))
+    return traces, data["label"]
+
+
+def _score_batch(args):
+    traces, labels, names, combos, base = args
+    n_obj = len(labels)
+    n_combo = len(combos)
+    tiled = [np.tile(t, (n_combo, 1)) for t in traces]
+    params = dict(base)
+    for j, name in enumerate(names):
+        params[name] = np.repeat(combos[:, j], n_obj)
+    events = run_state_machine(*tiled, params=params)
+
+    combo_of = events["trace"] // n_obj
+    correct = events["cls"] == labels[events["trace"] % n_obj]
+    accuracy = np.bincount(combo_of, weights=correct, minlength=n_combo) / n_obj
+    done = np.bincount(combo_of, minlength=n_combo)
+    hold = np.bincount(combo_of, weights=events["hold_loops"], minlength=n_combo)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hold_s = hold / done * LOOP_PERIOD
+    per_minute = 60.0 / (hold_s + HANDLING_TIME)
+    return accuracy, np.nan_to_num(per_minute)
+
+
+def grid_search(traces, labels, grid=GRID, base=None, workers=WORKERS):
+    """Score every combination in `grid`; returns (names, combos, accuracy, objects_per_min)."""
+    base = dict(base or {})
+    names = list(grid)
+    combos = np.array(list(itertools.product(*(grid[k] for k in names))), dtype=np.float64)
+    per_batch = max(1, MAX_BATCH // len(labels))
+    batches = [(traces, labels, names, combos[i:i + per_batch], base)
+               for i in range(0, len(combos), per_batch)]
+
+    if workers > 1 and len(batches) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_score_batch, batches))
+    else:
+        results = [_score_batch(b) for b in batches]
+    accuracy = np.concatenate([r[0] for r in results])
+    per_minute = np.concatenate([r[1] for r in results])
+    return names, combos, accuracy, per_minute
+
+
+def pareto_front(accuracy, per_minute):
+    """Indices of combinations not beaten on both accuracy and throughput."""
+    order = np.lexsort((-accuracy, -per_minute))   # fastest first, best accuracy on ties
+    front = []
+    best = -np.inf
+    for i in order:
+        if accuracy[i] > best:
+            front.append(i)
+            best = accuracy[i]
+    return np.array(front, dtype=np.int64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LAB20 threshold / stabilization search")
+    parser.add_argument("recording", nargs="?", help="labeled .npz recording (default: synthetic traces)")
+    parser.add_argument("--average", action="store_true", help="classify the locked colour average")
+    args = parser.parse_args()
+
+    if args.recording:
+        traces, labels = load_recording(args.recording)
+    else:
+        print("No recording given, using synthetic traces.")
+        traces, labels = synthetic_traces(500, np.random.default_rng(0))
+    base = {"CLASSIFY_ON_AVERAGE": True} if args.average else {}
+
+    names, combos, accuracy, per_minute = grid_search(traces, labels, base=base)
+    front = pareto_front(accuracy, per_minute)
+
+    firmware = np.array([DEFAULT_PARAMS[k] for k in names])
+    match = np.flatnonzero((combos == firmware).all(axis=1))
+    if len(match):
+        i = match[0]
+        print(f"Firmware settings: accuracy {accuracy[i] * 100:.1f}% @ {per_minute[i]:.1f} objects/min")
+
+    print(f"Pareto frontier ({len(front)} of {len(combos)} combinations):")
+    print("  acc%   obj/min  " + "  ".join(names))
+    for i in front[::-1]:
+        values = "  ".join(f"{v:g}" for v in combos[i])
+        print(f"  {accuracy[i] * 100:5.1f}  {per_minute[i]:7.1f}  {values}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,187 @@
+import math
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import numpy as np
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from lab_tools import follow, start_sweep
+
+PWM_TO_V = 3.3 / 255
+THRESHOLD_V = 2.2
+NOISE_MODELS = ("uniform", "gaussian")
+PHASES = 64          # phase points for averaging over a sinusoidal modulation
+MC_STEP = 4          # PWM between Monte Carlo noise levels
+SEGMENT = 4096       # samples per FFT segment (periodic mode), a multiple of every drive period
+BATCH_SEGMENTS = 256 # segments generated and transformed at once
+SNR_BAND = 8         # bins each side of the drive frequency used as the noise floor
+SR_LEVELS_PER_STEP = 4   # noise levels per background step (run in parallel, then shown)
+
 st.title("Quantum Stochastic Resonance (QSR) Simulator")
 st.markdown("### STM32 + NE555 Hardware Logic Simulation")
 
-@st.cache_data
-def ne555_trigger_simulation(signal_pwm, noise_max_pwm, threshold_voltage=2.2, trials=200):
+@st.cache_data(show_spinner=False)   # also called from the background sweep thread
+def ne555_trigger_simulation(signal_pwm, noise_max_pwm, threshold_voltage=2.2, trials=200,
+                             model="uniform", modulation=0.0):
     """Complete Monte Carlo simulation matching Arduino hardware"""
     signal_V = signal_pwm / 255 * 3.3
-    
-    hit_count = 0
-    for _ in range(trials):
-        noise_V = np.random.uniform(0, noise_max_pwm / 255 * 3.3)
-        if (signal_V + noise_V) > threshold_voltage:
-            hit_count += 1
-    
+    noise_max_V = noise_max_pwm / 255 * 3.3
+    if modulation:
+        noise_max_V = noise_max_V * (1 + modulation * np.sin(np.random.uniform(0, 2 * np.pi, trials)))
+
+    if model == "gaussian":
+        noise_V = np.random.normal(noise_max_V / 2, noise_max_V / np.sqrt(12), trials)
+    else:
+        noise_V = np.random.uniform(0, noise_max_V, trials)
+    hit_count = np.count_nonzero((signal_V + noise_V) > threshold_voltage)
+
     return (hit_count / trials) * 100
 
-# --- Hardware Parameters ---
-col1, col2, col3 = st.columns(3)
-signal_val = col1.slider("Signal Baseline (PWM)", 0, 200, 135)
-max_scan_noise = col2.slider("Max Noise Scan (PWM)", 100, 255, 220)
-trials_count = col3.slider("Monte Carlo Trials", 50, 500, 200)
 
-st.markdown("---")
+def noise_exceeds(margin_v, noise_v, model="uniform"):
+    """P(noise > margin_v) for noise of amplitude noise_v volts (arrays broadcast).
 
-# --- Run Simulation ---
-if st.button("🔄 Simulate Stochastic Resonance", type="primary"):
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    noise_levels = np.arange(0, max_scan_noise, 4)
-    detection_rates = []
-    
-    for i, n_level in enumerate(noise_levels):
-        rate = ne555_trigger_simulation(signal_val, n_level, trials=trials_count)
-        detection_rates.append(rate)
-        
-        progress = (i + 1) / len(noise_levels)
-        progress_bar.progress(progress)
-        status_text.text(f"Simulating noise level {n_level:.0f} PWM... ({progress:.1%})")
-    
-    status_text.text("✅ Simulation complete!")
+    uniform:  noise ~ U[0, noise_v], the Arduino random(0, N) PWM
+    gaussian: same mean and variance, noise ~ N(noise_v / 2, noise_v^2 / 12)
+    """
+    margin_v, noise_v = np.broadcast_arrays(np.asarray(margin_v, dtype=float), np.asarray(noise_v, dtype=float))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if model == "uniform":
+            p = np.clip((noise_v - margin_v) / noise_v, 0.0, 1.0)
+        elif model == "gaussian":
+            sigma = noise_v / np.sqrt(12)
+            z = (margin_v - noise_v / 2) / (sigma * np.sqrt(2))
+            p = 0.5 * np.frompyfunc(math.erfc, 1, 1)(np.nan_to_num(z)).astype(float)
+        else:
+            raise ValueError(f"unknown noise model {model!r}")
+    return np.where(noise_v > 0, p, (margin_v < 0).astype(float))   # no noise: signal alone decides
+
+
+def detection_probability(signal_pwm, noise_pwm, threshold_voltage=THRESHOLD_V, model="uniform",
+                          modulation=0.0, phases=PHASES):
+    """Exact P_det (%) for each noise level, no sampling.
+
+    With modulation m the noise amplitude is N * (1 + m sin(phase)); P_det is
+    averaged over one period on `phases` evenly spaced points (for a periodic
+    integrand this rule converges very fast).
+    """
+    margin = threshold_voltage - signal_pwm * PWM_TO_V
+    noise_v = np.asarray(noise_pwm, dtype=float) * PWM_TO_V
+    if modulation:
+        phase = 2 * np.pi * (np.arange(phases) + 0.5) / phases
+        amplitude = noise_v[..., None] * (1 + modulation * np.sin(phase))
+        return noise_exceeds(margin, amplitude, model).mean(axis=-1) * 100
+    return noise_exceeds(margin, noise_v, model) * 100
+
+
+def monte_carlo_deviation(mc_rates, exact_rates, trials):
+    """(max |MC - exact| in %, max |z| in units of the binomial standard error)."""
+    mc = np.asarray(mc_rates, dtype=float) / 100
+    exact = np.asarray(exact_rates, dtype=float) / 100
+    err = np.sqrt(np.maximum(exact * (1 - exact), 0.25 / trials) / trials)
+    return float(np.max(np.abs(mc - exact)) * 100), float(np.max(np.abs(mc - exact) / err))
+
+def periodic_margin(signal_pwm, drive_pwm, period, threshold_voltage=THRESHOLD_V, segment=SEGMENT):
+    """Volts the noise must add to trigger, over one segment of the drive
+    signal_pwm + drive_pwm * sin(2 pi t / period)."""
+    t = np.arange(segment)
+    signal_v = (signal_pwm + drive_pwm * np.sin(2 * np.pi * t / period)) * PWM_TO_V
+    return threshold_voltage - signal_v
+
+
+def sr_spectrum(margin, noise_pwm, n_samples, model="uniform", seed=None, batch=BATCH_SEGMENTS):
+    """Average power spectrum of the NE555 output (1 = triggered) for one noise level.
+
+    The comparator output is generated in (batch, segment) blocks and each row
+    is transformed with one rfft call, so memory stays at batch * segment
+    floats however long the run is. Returns (power per rfft bin, firing rate).
+    """
+    rng = np.random.default_rng(seed)
+    segment = len(margin)
+    n_segments = max(1, n_samples // segment)
+    noise_v = noise_pwm * PWM_TO_V
+    # compare raw draws against a per-sample limit instead of scaling the noise
+    if noise_v <= 0:
+        limit = None
+    elif model == "uniform":
+        limit = (margin / noise_v).astype(np.float32)
+    elif model == "gaussian":
+        limit = ((margin - noise_v / 2) / (noise_v / np.sqrt(12))).astype(np.float32)
+    else:
+        raise ValueError(f"unknown noise model {model!r}")
+
+    power = np.zeros(segment // 2 + 1)
+    fired = 0
+    draws = np.empty((min(batch, n_segments), segment), dtype=np.float32)
+    for start in range(0, n_segments, batch):
+        rows = min(batch, n_segments - start)
+        if limit is None:
+            out = np.broadcast_to(margin < 0, (rows, segment)).astype(np.float32)
+        else:
+            block = draws[:rows]
+            if model == "uniform":
+                rng.random(dtype=np.float32, out=block)
+            else:
+                rng.standard_normal(dtype=np.float32, out=block)
+            out = (block > limit).astype(np.float32)
+        fired += int(out.sum())
+        spectrum = np.fft.rfft(out, axis=1)
+        power += (spectrum.real ** 2 + spectrum.imag ** 2).sum(axis=0)
+    return power / n_segments, fired / (n_segments * segment)
+
+
+def output_snr(power, drive_bin, band=SNR_BAND):
+    """SNR (dB) at the drive bin: signal power above the local noise floor / floor.
+
+    Without noise in the output the ratio is undefined: -inf when the output
+    is constant (never or always fired), +inf when it is a clean copy of the drive.
+    """
+    lo = max(1, drive_bin - band)
+    neighbours = np.r_[power[lo:drive_bin - 1], power[drive_bin + 2:drive_bin + band + 1]]
+    floor = np.mean(neighbours) if len(neighbours) else 0.0
+    if floor <= 0:
+        return np.inf if power[drive_bin] > 0 else -np.inf
+    return 10 * np.log10(max(power[drive_bin] - floor, floor * 1e-3) / floor)
+
+
+def sr_sweep(signal_pwm, drive_pwm, noise_levels, period, n_samples, model="uniform",
+             threshold_voltage=THRESHOLD_V, seed=0, workers=None):
+    """Output SNR (dB), firing rate and spectrum for every noise level.
+
+    Levels run in parallel threads (the random fill and the FFT release the
+    GIL), each with its own generator spawned from `seed`.
+    """
+    workers = workers or os.cpu_count() or 1
+    margin = periodic_margin(signal_pwm, drive_pwm, period, threshold_voltage)
+    drive_bin = SEGMENT // period
+    seeds = np.random.SeedSequence(seed).spawn(len(noise_levels))
+
+    def run(args):
+        return sr_spectrum(margin, args[0], n_samples, model, args[1])
 
-    # --- Visualization ---
+    jobs = list(zip(noise_levels, seeds))
+    if workers > 1 and len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run, jobs))
+    else:
+        results = [run(j) for j in jobs]
+    spectra = np.array([r[0] for r in results])
+    rates = np.array([r[1] for r in results])
+    snr = np.array([output_snr(p, drive_bin) for p in spectra])
+    return snr, rates, spectra
+
+
+def detection_figure(signal_val, noise_levels, detection_rates, mc_levels, mc_rates, trials_count):
     fig, ax1 = plt.subplots(figsize=(14, 8))
     
-    # Orange Line: Detection Rate
-    ax1.plot(noise_levels, detection_rates, 'o-', color='tab:orange', 
-             linewidth=3, markersize=6, label='Detection Rate P_det (%)')
+    # Orange Line: Detection Rate (exact), dots: Monte Carlo
+    ax1.plot(noise_levels, detection_rates, '-', color='tab:orange',
+             linewidth=3, label='Detection Rate P_det (%)')
+    if len(mc_rates):
+        ax1.plot(mc_levels, mc_rates, 'o', color='tab:orange', markersize=6, alpha=0.6,
+                 markerfacecolor='none', label=f'Monte Carlo ({trials_count} trials)')
     ax1.set_xlabel('Noise Amplitude N_amp (PWM)')
     ax1.set_ylabel('P_det (%)', color='tab:orange')
     ax1.tick_params(axis='y', labelcolor='tab:orange')
@@ -72,12 +204,41 @@ if st.button("🔄 Simulate Stochastic Resonance", type="primary"):
     ax1.axvline(x=threshold_cross, color='red', linestyle=':', alpha=0.8, 
                 label='Threshold Crossing')
     
-    plt.title('Stochastic Resonance: Optimal Noise Detection Peak')
+    ax1.set_title('Stochastic Resonance: Optimal Noise Detection Peak')
     fig.legend(loc='upper center', bbox_to_anchor=(0.5, -0.03), ncol=4)
-    plt.tight_layout()
-    
-    st.pyplot(fig)
-    
+    fig.tight_layout()
+    return fig
+
+
+def show_detection_sweep(signal_val, max_scan_noise, trials_count, noise_model, modulation, resolution,
+                         cross_check, retry=False):
+    # Exact curve at any resolution, then Monte Carlo on the coarse grid as a check
+    noise_levels = np.arange(0, max_scan_noise, resolution)
+    detection_rates = detection_probability(signal_val, noise_levels, model=noise_model, modulation=modulation)
+
+    mc_levels = np.arange(0, max_scan_noise, MC_STEP)
+    if cross_check:
+        # Monte Carlo runs in the background; the chart fills in as levels finish
+        job = start_sweep(
+            ("qsr_mc", signal_val, max_scan_noise, trials_count, noise_model, modulation),
+            lambda n_level: ne555_trigger_simulation(signal_val, n_level, trials=trials_count,
+                                                     model=noise_model, modulation=modulation),
+            mc_levels, retry=retry)
+        done_levels, mc_rates = follow(
+            job, lambda lv, rates: detection_figure(signal_val, noise_levels, detection_rates, lv, rates, trials_count),
+            label="Simulating noise levels", cancel_key="cancel_mc")
+        if mc_rates:
+            max_dev, max_z = monte_carlo_deviation(
+                mc_rates, detection_probability(signal_val, done_levels, model=noise_model, modulation=modulation),
+                trials_count)
+            done = "✅ Simulation complete!" if job.complete() else f"Partial ({len(mc_rates)} levels):"
+            st.text(f"{done} Monte Carlo vs exact: max deviation {max_dev:.1f}% "
+                    f"({max_z:.1f} σ of the {trials_count}-trial sampling error)")
+    else:
+        fig = detection_figure(signal_val, noise_levels, detection_rates, [], [], trials_count)
+        st.pyplot(fig)
+        plt.close(fig)
+
     # --- Auto-Grading (FIXED: No np.argwhere in f-strings) ---
     st.markdown("### 📊 Results Analysis")
     col_a, col_b, col_c = st.columns(3)
@@ -103,7 +264,7 @@ if st.button("🔄 Simulate Stochastic Resonance", type="primary"):
     
     # Resonance zone (Safe calculation)
     st.markdown("### 💡 Resonance Zone")
-    rising_idx = np.where(np.diff(detection_rates) > 0)[0]
+    rising_idx = np.where(np.diff(detection_rates) > 1e-6)[0]
     if len(rising_idx) > 0:
         zone_start = float(noise_levels[rising_idx[0]])
         zone_end = float(noise_levels[min(rising_idx[-1] + 1, len(noise_levels)-1)])
@@ -111,13 +272,139 @@ if st.button("🔄 Simulate Stochastic Resonance", type="primary"):
     else:
         st.warning("No clear resonance detected - try different signal level")
 
+
+def snr_figure(sr_levels, snr_db, fire_rates, spectra, drive_bin):
+    fig, (ax_snr, ax_psd) = plt.subplots(1, 2, figsize=(14, 5))
+    finite = np.isfinite(snr_db)
+    ax_snr.plot(sr_levels[finite], snr_db[finite], 'o-', color='tab:purple', linewidth=2, markersize=4,
+                label='Output SNR (dB)')
+    # levels without output noise have no finite SNR: mark them along the bottom instead
+    for mask, marker, label in ((snr_db == -np.inf, 'x', 'Constant output (SNR -∞)'),
+                                (snr_db == np.inf, '^', 'Noise-free output (SNR +∞)')):
+        if mask.any():
+            ax_snr.plot(sr_levels[mask], np.full(mask.sum(), 0.03), marker, color='tab:gray',
+                        transform=ax_snr.get_xaxis_transform(), label=label)
+    if not finite.all():
+        ax_snr.legend(loc='upper right')
+    ax_snr.set_xlabel('Noise Amplitude N_amp (PWM)')
+    ax_snr.set_ylabel('SNR at drive frequency (dB)', color='tab:purple')
+    ax_snr.grid(True, alpha=0.3)
+    ax_rate = ax_snr.twinx()
+    ax_rate.plot(sr_levels, fire_rates * 100, color='tab:orange', alpha=0.6, label='Firing rate (%)')
+    ax_rate.set_ylabel('Firing rate (%)', color='tab:orange')
+    ax_snr.set_title('Stochastic Resonance: SNR vs Noise')
+
+    # Spectra below, at and above the optimum
+    if finite.any():
+        best = int(np.where(finite, snr_db, -np.inf).argmax())
+        first = int(np.flatnonzero(finite)[0])
+        freq = np.arange(spectra.shape[1]) / drive_bin   # in units of the drive frequency
+        for idx, color in ((first, 'tab:gray'), (best, 'tab:purple'), (len(sr_levels) - 1, 'tab:blue')):
+            ax_psd.semilogy(freq[1:], spectra[idx, 1:], color=color, linewidth=1,
+                            label=f'N = {sr_levels[idx]:.0f} PWM ({snr_db[idx]:.1f} dB)')
+        ax_psd.set_xlim(0, 4)
+        ax_psd.set_xlabel('Frequency / drive frequency')
+        ax_psd.set_ylabel('Output power')
+        ax_psd.legend()
+        ax_psd.grid(True, alpha=0.3)
+        ax_psd.set_title('NE555 Output Spectrum')
+    fig.tight_layout()
+    return fig
+
+
+def _join_sr(steps, parts):
+    """Concatenate per-step sr_sweep results into (levels, snr, rates, spectra)."""
+    levels = np.concatenate([chunk for _, chunk in steps])
+    return (levels, np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts]),
+            np.concatenate([p[2] for p in parts]))
+
+
+def show_snr_sweep(signal_val, drive_val, drive_period, samples_per_level, max_scan_noise, noise_model,
+                   retry=False):
+    sr_levels = np.arange(0, max_scan_noise, MC_STEP)
+    steps = [(i, sr_levels[i:i + SR_LEVELS_PER_STEP]) for i in range(0, len(sr_levels), SR_LEVELS_PER_STEP)]
+    drive_bin = SEGMENT // drive_period
+    job = start_sweep(
+        ("qsr_snr", signal_val, drive_val, drive_period, samples_per_level, max_scan_noise, noise_model),
+        lambda step: sr_sweep(signal_val, drive_val, step[1], drive_period, samples_per_level,
+                              model=noise_model, seed=(0, step[0])),
+        steps, retry=retry)
+    steps_done, parts = follow(job, lambda st_, pa: snr_figure(*_join_sr(st_, pa), drive_bin),
+                               label="Simulating noise levels", cancel_key="cancel_snr")
+    if not parts:
+        return
+    sr_levels, snr_db, fire_rates, spectra = _join_sr(steps_done, parts)
+
+    finite = np.isfinite(snr_db)
+    if finite.any():
+        best = int(np.where(finite, snr_db, -np.inf).argmax())
+        col_d, col_e, col_f = st.columns(3)
+        col_d.metric("🎯 Optimal Noise", f"{sr_levels[best]:.0f} PWM")
+        col_e.metric("📈 Peak SNR", f"{snr_db[best]:.1f} dB")
+        col_f.metric("🔥 Firing Rate at Peak", f"{fire_rates[best] * 100:.1f}%")
+        silent = int((snr_db == -np.inf).sum())
+        if silent:
+            st.caption(f"{silent} noise level(s) with a constant output (never or always fired) have no SNR (marked ✕)")
+    elif not fire_rates.any():
+        st.warning("The output never fires - raise the noise scan or the signal")
+    if signal_val + drive_val >= THRESHOLD_V / PWM_TO_V:
+        st.warning("Signal peaks reach the threshold on their own: no noise is needed, so this is not stochastic resonance.")
+
+
+# --- Hardware Parameters ---
+col1, col2, col3 = st.columns(3)
+signal_val = col1.slider("Signal Baseline (PWM)", 0, 200, 135)
+max_scan_noise = col2.slider("Max Noise Scan (PWM)", 100, 255, 220)
+trials_count = col3.slider("Monte Carlo Trials", 50, 500, 200)
+
+col4, col5, col6 = st.columns(3)
+noise_model = col4.selectbox("Noise Model", NOISE_MODELS, help="uniform = Arduino random(0, N)")
+modulation = col5.slider("Noise Modulation Depth", 0.0, 1.0, 0.0, 0.05,
+                         help="noise amplitude N * (1 + m sin(phase))")
+resolution = col6.select_slider("Noise Resolution (PWM)", [0.25, 0.5, 1, 2, 4], value=1)
+cross_check = st.checkbox("Monte Carlo cross-check", value=True)
+
+st.markdown("---")
+
+# --- Run Simulation ---
+# Parameters are kept when the button is pressed, so the results (and a
+# running sweep) stay on the page while other widgets change
+clicked = st.button("🔄 Simulate Stochastic Resonance", type="primary")
+if clicked:
+    st.session_state.qsr_run = (signal_val, max_scan_noise, trials_count, noise_model, modulation,
+                                resolution, cross_check)
+if "qsr_run" in st.session_state:
+    show_detection_sweep(*st.session_state.qsr_run, retry=clicked)
+
+# --- Periodic Signal Mode ---
+st.markdown("---")
+st.markdown("### 📡 Periodic Signal: Output SNR")
+st.caption("Signal = baseline + sinusoidal PWM drive, fresh noise every sample, NE555 output spectrum per noise level")
+col7, col8, col9 = st.columns(3)
+drive_val = col7.slider("Drive Amplitude (PWM)", 0, 60, 20)
+drive_period = col8.select_slider("Drive Period (samples)", [16, 32, 64, 128, 256], value=64)
+samples_per_level = col9.select_slider("Samples per Noise Level", [10**5, 3 * 10**5, 10**6, 10**7], value=3 * 10**5)
+
+clicked = st.button("📡 Simulate SNR Resonance")
+if clicked:
+    st.session_state.qsr_snr_run = (signal_val, drive_val, drive_period, samples_per_level, max_scan_noise,
+                                    noise_model)
+if "qsr_snr_run" in st.session_state:
+    show_snr_sweep(*st.session_state.qsr_snr_run, retry=clicked)
+
 # --- Instructions ---
 with st.expander("📖 Hardware Correlation"):
     st.markdown("""
     **Matches Arduino Serial Plotter exactly:**
-    - **Orange**: P_det = (hit_count / 200) × 100%
+    - **Orange**: P_det = (hit_count / 200) × 100%. The line is the exact value, P_det = (N - d) / N
+      for uniform noise of amplitude N and threshold gap d = 2.2 V - signal (0 when N ≤ d); the circles
+      are the Monte Carlo estimate it is checked against
     - **Green**: Fixed sub-threshold signal (~1.75V)
     - **Blue**: Scanning noise amplitude
     
     **Expected**: Bell curve peaking at 80-120 PWM
+
+    **Periodic mode**: with a constant signal the detection rate only climbs with noise. True stochastic
+    resonance shows up in the SNR at the drive frequency: too little noise and the sub-threshold drive
+    never fires the NE555, too much and the firings no longer follow the drive. In between, the SNR peaks.
     """)
\ No newline at end of file
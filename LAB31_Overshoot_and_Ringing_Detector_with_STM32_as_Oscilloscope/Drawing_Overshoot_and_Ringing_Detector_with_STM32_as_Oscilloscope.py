@@ -1,23 +1,40 @@
+import os
+import sys
 import serial
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
-from scipy.ndimage import uniform_filter1d
 from scipy.signal import find_peaks
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from lab_tools import (
+    AdcConverter, FrameProfiler, MinMaxPyramid, MultiChannelAcquisition, StatsPanel, StreamFilter,
+    StreamStats, TriggerEngine,
+)
 
 # ===== User settings =====
 PORT = "COM3"
 BAUD = 115200
-BUFFER_SIZE = 1024
+BUFFER_SIZE = 1024    # samples per channel per frame
+N_CHANNELS = 1        # >1: interleaved scan-mode DMA, channel order as in LAB25 (PA0, PA1, PA2, ...)
+CHANNEL_NAMES = ["PA0", "PA1", "PA2", "PA3", "PA4", "PA5", "PA6", "PA7"]
 VREF = 3.3
 SAMPLE_RATE = 170000  # Hz, adjust to actual ADC/TIM settings
+FRAME_INTERVAL_MS = 50
+BOARD = None          # key in lab_tools/adc_calibration.json, None = nominal scale
+TEST_TONE_HZ = None   # Hz of a known sine on PA0 to measure the real ADC rate, None = off
+STATS_FILE = "stream_stats.json"
 
 
 # Trigger & Analysis params
 TRIGGER_THRESHOLD = 0.5 * VREF   # trigger threshold
 PRE_SAMPLES = 100
 POST_SAMPLES = 300
+TRIGGER_MODE = "rising"          # rising / falling / window / pulse (see lab_tools/trigger.py)
+TRIGGER_HYSTERESIS = 0.05 * VREF
+TRIGGER_HOLDOFF = POST_SAMPLES   # samples after a trigger before the next one is accepted
+CONTIGUOUS_FRAMES = False        # True only if the firmware streams without gaps between frames
+SMOOTHING = dict(kind="moving_average", size=8)   # see lab_tools/filters.py
 STEADY_FRAC = 0.9
 RINGING_FRAC = 0.2
 MAX_RINGING_FREQ = 200000  # Hz, expected max ringing freq
@@ -25,6 +42,22 @@ MAX_RINGING_FREQ = 200000  # Hz, expected max ringing freq
 
 # ===== Serial init =====
 ser = serial.Serial(PORT, BAUD, timeout=0.5)
+adc = AdcConverter(vref=VREF, board=BOARD)
+acq = MultiChannelAcquisition(adc, N_CHANNELS, BUFFER_SIZE)
+smoothers = [StreamFilter(**SMOOTHING) for _ in range(N_CHANNELS)]
+smooth_buffers = np.empty((N_CHANNELS, BUFFER_SIZE), dtype=np.float32)
+triggers = [
+    TriggerEngine(
+        mode=TRIGGER_MODE,
+        level=TRIGGER_THRESHOLD,
+        hysteresis=TRIGGER_HYSTERESIS,
+        pre=PRE_SAMPLES,
+        post=POST_SAMPLES,
+        holdoff=TRIGGER_HOLDOFF,
+    )
+    for _ in range(N_CHANNELS)
+]
+stats = StreamStats(stages=("read", "convert", "smooth", "peaks", "render"), nominal_rate=SAMPLE_RATE)
 
 
 # ===== Analysis functions =====
@@ -125,12 +158,15 @@ def analyze_overshoot_ringing(
 plt.ion()
 fig, (ax1, ax2) = plt.subplots(2, 1, height_ratios=[3, 1])
 
-WINDOW = 256
-x = np.arange(WINDOW)
-y = np.zeros(WINDOW)
-wave_line, = ax1.plot(x, y, label="waveform")
+# Display: min/max envelope of the last DISPLAY_SAMPLES samples, ~2 points per pixel
+DISPLAY_SAMPLES = 1 << 17
+SCREEN_PIXELS = 800
+histories = [MinMaxPyramid(capacity=1 << 20) for _ in range(N_CHANNELS)]
+wave_lines = [ax1.plot([], [], label=CHANNEL_NAMES[ch] if N_CHANNELS > 1 else "waveform")[0]
+              for ch in range(N_CHANNELS)]
 
-ax1.set_xlabel("Sample index")
+ax1.set_xlabel("Samples before newest")
+ax1.set_xlim(-DISPLAY_SAMPLES, 0)
 ax1.set_ylabel("Voltage (V)")
 ax1.set_ylim(0, VREF)
 ax1.set_title("STM32 Oscilloscope + Overshoot/Ringing Detector")
@@ -141,51 +177,75 @@ status_text = status_ax.text(
     0.05, 0.5, "Ready...", transform=status_ax.transAxes, va="center", fontsize=12
 )
 
-latest_results = None
+stats_panel = StatsPanel(fig, stats)
 
+latest_results = [None] * N_CHANNELS
+
+
+def trigger_and_analyze(ch, smooth):
+    """Run one channel's trigger and analyze every captured edge; returns [(capture, results)]."""
+    trigger = triggers[ch]
+    if CONTIGUOUS_FRAMES:
+        captures = trigger.push(smooth)
+    else:
+        # each read is a separate DMA snapshot: no edges across the gap,
+        # and windows near the end of the frame are cut short
+        trigger.reset()
+        captures = trigger.push(smooth) + trigger.flush()
+    return [(capture, analyze_overshoot_ringing(capture.window)) for capture in captures]
 
-def update(frame):
-    global latest_results
 
-    n_bytes = BUFFER_SIZE * 2
+def update(frame):
+    stats.start_frame()
+    n_bytes = acq.bytes_per_frame(BUFFER_SIZE)
     raw = ser.read(n_bytes)
+    stats.lap("read")
     if len(raw) != n_bytes:
         print(f"Short read: {len(raw)} bytes")
-        return wave_line, status_text
-
-    # ADC -> volts
-    data = np.frombuffer(raw, dtype=np.uint16)
-    volt = data * VREF / 4095.0
-    smooth = uniform_filter1d(volt, size=8)
-
-    # ---- detect & analyze on full buffer ----
-    trigger_idx, window, start = detect_rising_edge_window(smooth)
-    if window is not None:
-        latest_results = analyze_overshoot_ringing(window)
-        if latest_results is not None:
-            print(
-                f"Trigger {trigger_idx}, win_len {len(window)}, "
-                f"ADC_max {data.max()} counts, "
-                f"V_max_window {window.max():.3f} V, "
-                f"peaks {latest_results['num_peaks']}"
-            )
-
-    # ---- display: always show last WINDOW samples (oscilloscope view) ----
-    segment = smooth[-WINDOW:]
-    x_seg = np.arange(len(segment))
-
-    wave_line.set_xdata(x_seg)
-    wave_line.set_ydata(segment)
-    ax1.set_xlim(x_seg[0], x_seg[-1])
+        return (*wave_lines, status_text, stats_panel.update())
+    stats.arrived(BUFFER_SIZE * N_CHANNELS, n_bytes)
+
+    # ADC -> volts, one (N_CHANNELS, BUFFER_SIZE) block of strided views
+    volts = acq.push(raw)
+    stats.lap("convert")
+    for ch in range(N_CHANNELS):
+        if not CONTIGUOUS_FRAMES:
+            smoothers[ch].reset()   # no filter state across the gap between DMA snapshots
+        smoothers[ch].process(volts[ch], smooth_buffers[ch])
+    if TEST_TONE_HZ:
+        stats.tone_frame(volts[0], TEST_TONE_HZ)
+    stats.lap("smooth")
+
+    # ---- trigger & analyze every captured edge, channels in parallel ----
+    for ch, analyzed in enumerate(acq.map(trigger_and_analyze, smooth_buffers)):
+        for capture, results in analyzed:
+            latest_results[ch] = results
+            if results is not None:
+                name = f"{CHANNEL_NAMES[ch]} " if N_CHANNELS > 1 else ""
+                print(
+                    f"{name}Trigger {capture.index}, win_len {len(capture.window)}, "
+                    f"ADC_max {acq.codes[ch].max()} counts, "
+                    f"V_max_window {capture.window.max():.3f} V, "
+                    f"peaks {results['num_peaks']}"
+                )
+
+    stats.lap("peaks")
+
+    # ---- display: peak-detect envelope of the recent history (oscilloscope view) ----
+    for ch, history in enumerate(histories):
+        history.append(smooth_buffers[ch])
+        x_env, y_env = history.view(history.end - DISPLAY_SAMPLES, history.end, SCREEN_PIXELS)
+        wave_lines[ch].set_xdata(x_env - history.end)
+        wave_lines[ch].set_ydata(y_env)
     ax1.set_ylim(0, VREF)
 
     # remove old V_steady / V_max lines
-    for line_obj in ax1.get_lines()[1:]:
+    for line_obj in ax1.get_lines()[N_CHANNELS:]:
         line_obj.remove()
 
-    # draw V_steady, V_max if valid results
-    if latest_results is not None:
-        res = latest_results
+    # draw V_steady, V_max of the first channel if valid results
+    if latest_results[0] is not None:
+        res = latest_results[0]
         ax1.axhline(
             res["v_steady"],
             color="g",
@@ -210,13 +270,23 @@ def update(frame):
         )
     else:
         status = "No valid rising edge window"
+    for ch in range(1, N_CHANNELS):
+        res = latest_results[ch]
+        status += f"\n{CHANNEL_NAMES[ch]}: " + (
+            f"Overshoot {res['overshoot_pct']:.1f}%  |  Ring {res['ringing_freq_khz']:.1f} kHz"
+            if res is not None else "no valid window"
+        )
 
     status_text.set_text(status)
+    stats.lap("render")
 
-    return wave_line, status_text
+    return (*wave_lines, status_text, stats_panel.update())
 
 
-ani = FuncAnimation(fig, update, interval=50, blit=True)
+# LAB_PROFILE=1 or --profile: per-frame timing, overruns, cProfile snapshots
+profiler = FrameProfiler(FRAME_INTERVAL_MS, stats=stats, name="lab31")
+profiler.attach(fig)
+ani = FuncAnimation(fig, profiler.wrap(update), interval=FRAME_INTERVAL_MS, blit=True)
 plt.tight_layout()
 plt.show()
 
@@ -225,3 +295,7 @@ try:
         plt.pause(0.1)
 except KeyboardInterrupt:
     ser.close()
+    acq.close()
+    stats.dump(STATS_FILE)
+    if profiler.enabled:
+        print(profiler.report())
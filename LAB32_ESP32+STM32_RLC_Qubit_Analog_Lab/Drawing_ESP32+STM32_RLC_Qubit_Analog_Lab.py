@@ -1,3 +1,5 @@
+import os
+import sys
 import serial
 import numpy as np
 import matplotlib.pyplot as plt
@@ -6,25 +8,44 @@ from scipy.ndimage import uniform_filter1d
 from scipy.signal import find_peaks, hilbert
 from scipy.optimize import curve_fit
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from lab_tools import (
+    AdcConverter, FrameProfiler, MinMaxPyramid, MultiChannelAcquisition, StatsPanel, StreamFilter, StreamStats,
+)
+
 # ===== STM32 Settings (match your CubeMX) =====
 PORT = "COM3"           
 BAUD = 115200
 BUFFER_SIZE = 1024
 VREF = 3.3
 SAMPLE_RATE = 170000    
+FRAME_SAMPLES = 2048    # samples per channel per read
+N_CHANNELS = 1          # >1: interleaved scan-mode DMA (LAB25 order PA0, PA1, ...)
+CHANNEL = 0             # channel analysed when N_CHANNELS > 1
+FRAME_INTERVAL_MS = 33
+DISPLAY_SAMPLES = 1 << 17   # waveform panel span, drawn as a min/max envelope
+SCREEN_PIXELS = 600
+BOARD = None            # key in lab_tools/adc_calibration.json, None = nominal scale
+TEST_TONE_HZ = None     # Hz of a known sine on PA0 to measure the real ADC rate, None = off
+SMOOTHING = None        # e.g. dict(kind="moving_average", size=8), see lab_tools/filters.py
+STATS_FILE = "stream_stats.json"
 
 # Qubit params
 F0_EXPECTED = 5033      
 T1_EXPECTED = 0.1       
 
 ser = serial.Serial(PORT, BAUD, timeout=0.5)
+adc = AdcConverter(vref=VREF, board=BOARD)
+acq = MultiChannelAcquisition(adc, N_CHANNELS, FRAME_SAMPLES)
+smoother = StreamFilter(**SMOOTHING) if SMOOTHING else None
+stats = StreamStats(stages=("read", "convert", "fft", "curve_fit", "render"), nominal_rate=SAMPLE_RATE)
 print(f"Qubit Scope: {PORT} @ {SAMPLE_RATE/1000:.0f}kSps")
 
 fig, ((ax_wave, ax_fft), (ax_rabi, ax_t1)) = plt.subplots(2, 2, figsize=(12, 10))
 fig.suptitle('ESP32+STM32 RLC Qubit Real-Time Analysis')
 
 # Buffers
-wave_buffer = np.zeros(4096)
+wave_buffer = MinMaxPyramid(capacity=1 << 20)
 fft_buffer = []
 rabi_data = {'time': [], 'amp': []}
 
@@ -43,6 +64,8 @@ ax_t1.set_xlabel('Time (s)'); ax_t1.set_ylabel('Envelope'); ax_t1.grid(alpha=0.3
 status_text = fig.text(0.02, 0.02, 'Ready...', fontsize=11, 
                        bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
 
+stats_panel = StatsPanel(fig, stats)
+
 plt.tight_layout()
 
 def exp_decay(t, A, tau, offset):
@@ -69,29 +92,41 @@ def analyze_qubit(volt):
             'envelope':envelope, 'rms':np.sqrt(np.mean(volt**2))}
 
 def update(frame):
-    global wave_buffer, fft_buffer, rabi_data
+    global fft_buffer, rabi_data
     
-    raw = ser.read(4096)
-    if len(raw) != 4096: 
+    stats.start_frame()
+    n_bytes = acq.bytes_per_frame(FRAME_SAMPLES)
+    raw = ser.read(n_bytes)
+    stats.lap('read')
+    if len(raw) != n_bytes: 
         status_text.set_text(f'Short read: {len(raw)}')
         return wave_line, fft_line, rabi_line, t1_line
+    stats.arrived(FRAME_SAMPLES * N_CHANNELS, n_bytes)
     
-    data = np.frombuffer(raw, dtype=np.uint16)
-    volt = data * VREF / 4095.0
+    volt = acq.push(raw)[CHANNEL]
+    if smoother is not None:
+        smoother.reset()   # each read is a separate DMA snapshot
+        smoother.process(volt, volt)
+    if TEST_TONE_HZ:
+        stats.tone_frame(volt, TEST_TONE_HZ)
+    stats.lap('convert')
     
     # Rolling buffer
-    wave_buffer = np.roll(wave_buffer, -len(volt))
-    wave_buffer[-len(volt):] = volt
+    wave_buffer.append(volt)
     
     analysis = analyze_qubit(volt)
+    stats.lap('fft')
     
-    # Waveform (last 1024 pts)
-    wave_line.set_data(np.arange(1024), wave_buffer[-1024:])
-    ax_wave.set_xlim(0, 1024)
+    # Waveform (peak-detect envelope of the last DISPLAY_SAMPLES)
+    x_env, y_env = wave_buffer.view(wave_buffer.end - DISPLAY_SAMPLES, wave_buffer.end, SCREEN_PIXELS)
+    wave_line.set_data(x_env - wave_buffer.end, y_env)
+    ax_wave.set_xlim(-DISPLAY_SAMPLES, 0)
+    stats.lap('render')
     
     # FFT
     f_disp = np.fft.rfftfreq(1024, 1/SAMPLE_RATE)/1000
-    fft_disp = np.abs(np.fft.rfft(wave_buffer[-1024:]))
+    fft_disp = np.abs(np.fft.rfft(wave_buffer.tail(1024)))
+    stats.lap('fft')
     fft_line.set_data(f_disp, fft_disp)
     ax_fft.set_xlim(0, 15); ax_fft.set_ylim(0, fft_disp.max()*1.1)
     
@@ -111,6 +146,8 @@ def update(frame):
         rabi_line.set_data(rabi_data['time'], rabi_data['amp'])
         ax_rabi.set_xlim(0, max(10, max(rabi_data['time'] or [0])))
     
+    stats.lap('render')
+    
     # T1 fit (last 100 envelope pts)
     if len(analysis['envelope']) > 100:
         t_fit = np.arange(100) / SAMPLE_RATE
@@ -121,17 +158,28 @@ def update(frame):
             t_plot = np.linspace(0, 0.2, 100)
             t1_line.set_data(t_plot, exp_decay(t_plot, *popt))
         except: pass
+    stats.lap('curve_fit')
     
     # Status
     status = (f"f_peak: {analysis['f_peak']:.1f}kHz | "
               f"V_steady: {analysis['v_steady']:.2f}V | "
               f"RMS: {analysis['rms']:.2f}V")
     status_text.set_text(status)
+    stats_panel.update()
+    stats.lap('render')
     
     return wave_line, fft_line, rabi_line, t1_line  # Fixed return!
 
+# LAB_PROFILE=1 or --profile: per-frame timing, overruns, cProfile snapshots
+profiler = FrameProfiler(FRAME_INTERVAL_MS, stats=stats, name="lab32")
+profiler.attach(fig)
+
 # FIXED: blit=False + explicit return
-ani = FuncAnimation(fig, update, interval=33, blit=False)
+ani = FuncAnimation(fig, profiler.wrap(update), interval=FRAME_INTERVAL_MS, blit=False)
 plt.show(block=True)
 
 ser.close()
+acq.close()
+stats.dump(STATS_FILE)
+if profiler.enabled:
+    print(profiler.report())
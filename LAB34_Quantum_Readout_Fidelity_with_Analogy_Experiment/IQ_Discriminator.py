@@ -0,0 +1,293 @@
+"""
+Two-state IQ discrimination for LAB34 readout points.
+
+fit_gmm() fits a two-component Gaussian mixture in the I/Q plane with EM.
+The points are processed in chunks and each iteration only keeps the
+per-component sums (weight, mean, second moment), so millions of points,
+or a memory-mapped Trial_Store, cost O(chunk) memory.
+
+Discriminator turns the fit (or labelled points, LDA) into a linear
+boundary w . (I, Q) + b > 0 -> state 1. Classifying a point is one dot
+product. Assignment fidelity is F = 1 - (P(1|0) + P(0|1)) / 2, reported with
+a Wilson confidence interval.
+
+A mixture fit always finds two components, even in single-state noise (a
+uniform blob gives "93 %"). An unlabelled fit is therefore only accepted when
+the states are separated (Mahalanobis distance >= MIN_SEPARATION) and the
+scores dip between them (two peaks); otherwise fit() raises ValueError.
+"""
+
+import math
+import sys
+
+import numpy as np
+
+# --- Configuration ---
+CHUNK = 1 << 20         # points per EM pass chunk
+MAX_ITER = 100
+TOL = 1e-7              # stop when the mean log-likelihood improves less than this
+CONFIDENCE_Z = 1.96     # 95 % intervals
+MIN_SEPARATION = 2.0    # state means closer than this (in pooled std) are one state
+MAX_DIP = 0.8           # score density between the states / at the smaller peak
+# ---------------------
+
+
+def _columns(points, start, chunk):
+    """Contiguous float64 I and Q columns of one chunk."""
+    x = np.asarray(points[start:start + chunk])
+    return np.ascontiguousarray(x[:, 0], dtype=np.float64), np.ascontiguousarray(x[:, 1], dtype=np.float64)
+
+
+def _log_gauss(i, q, mean, cov):
+    """log N((i, q) | mean, cov), 2x2 closed form."""
+    a, b, c = cov[0, 0], cov[0, 1], cov[1, 1]
+    det = a * c - b * b
+    d0 = i - mean[0]
+    d1 = q - mean[1]
+    maha = (c * d0 * d0 - 2 * b * d0 * d1 + a * d1 * d1) / det
+    return -0.5 * maha - math.log(2 * math.pi) - 0.5 * math.log(det)
+
+
+def _moments(points, weight_of, chunk=CHUNK):
+    """Per-component (sum w, sum w x, sum w x x^T).
+
+    weight_of(i, q, start) gives each point's weight for component 1;
+    component 0 gets the rest, so its sums follow from the totals.
+    """
+    n = np.zeros(2)
+    s1 = np.zeros((2, 2))
+    s2 = np.zeros((2, 2, 2))
+    for start in range(0, len(points), chunk):
+        i, q = _columns(points, start, chunk)
+        r = weight_of(i, q, start)
+        ri = r * i
+        rq = r * q
+        iq = i @ q
+        riq = ri @ q
+        n += (len(i), r.sum())
+        s1 += ((i.sum(), q.sum()), (ri.sum(), rq.sum()))
+        s2 += (((i @ i, iq), (iq, q @ q)), ((ri @ i, riq), (riq, rq @ q)))
+    n[0] -= n[1]
+    s1[0] -= s1[1]
+    s2[0] -= s2[1]
+    return n, s1, s2
+
+
+def _params(n, s1, s2, floor):
+    means = s1 / n[:, None]
+    covs = s2 / n[:, None, None] - np.einsum('ki,kj->kij', means, means)
+    covs += floor * np.eye(2)
+    return n / n.sum(), means, covs
+
+
+def fit_gmm(points, max_iter=MAX_ITER, tol=TOL, chunk=CHUNK):
+    """EM fit of a 2-component full-covariance mixture to (n, 2) points.
+
+    Starts from a split at the median of the first principal component.
+    Returns (weights, means, covs, log_likelihood per point); component 1 is
+    the one with the larger |mean| (the driven / "1" state).
+    """
+    total = len(points)
+    if total < 4:
+        raise ValueError("need at least 4 IQ points")
+    n, s1, s2 = _moments(points, lambda i, q, _: np.full(len(i), 0.5), chunk)
+    mean = s1[0] / n[0]
+    cov = s2[0] / n[0] - np.outer(mean, mean)
+    if not np.trace(cov) > 0:
+        raise ValueError("IQ points are all identical")
+    axis = np.linalg.eigh(cov)[1][:, -1]
+    floor = 1e-9 * np.trace(cov)
+
+    split = np.median(np.concatenate([np.asarray(points[start:start + chunk], dtype=np.float64) @ axis
+                                      for start in range(0, total, chunk)]))
+
+    n, s1, s2 = _moments(points, lambda i, q, _: (i * axis[0] + q * axis[1] > split).astype(np.float64), chunk)
+    if n.min() == 0:   # all points identical along the axis
+        n, s1, s2 = _moments(points, lambda i, q, _: np.full(len(i), 0.5), chunk)
+        s1[1] += 1e-6 * np.sqrt(np.trace(cov)) * axis * n[1]
+    weights, means, covs = _params(n, s1, s2, floor)
+
+    log_lik = -np.inf
+    for _ in range(max_iter):
+        state = {"ll": 0.0}
+
+        def responsibilities(i, q, _):
+            lp0 = math.log(weights[0]) + _log_gauss(i, q, means[0], covs[0])
+            lp1 = math.log(weights[1]) + _log_gauss(i, q, means[1], covs[1])
+            state["ll"] += float(np.logaddexp(lp0, lp1).sum())
+            with np.errstate(over='ignore'):   # exp -> inf gives weight 0, as it should
+                return 1.0 / (1.0 + np.exp(lp0 - lp1))
+
+        n, s1, s2 = _moments(points, responsibilities, chunk)
+        new_ll = state["ll"] / total
+        weights, means, covs = _params(np.maximum(n, 1e-12), s1, s2, floor)
+        if new_ll - log_lik < tol:
+            log_lik = new_ll
+            break
+        log_lik = new_ll
+
+    if np.hypot(*means[0]) > np.hypot(*means[1]):
+        weights, means, covs = weights[::-1], means[::-1], covs[::-1]
+    return weights, means, covs, log_lik
+
+
+def wilson(errors, n, z=CONFIDENCE_Z):
+    """Wilson interval (low, high) for a rate of `errors` out of `n`."""
+    if n <= 0:
+        return 0.0, 1.0
+    p = errors / n
+    denom = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def _tail(x):
+    """P(Z > x) for a standard normal."""
+    return 0.5 * math.erfc(x / math.sqrt(2))
+
+
+class Discriminator:
+    """Linear two-state boundary in the I/Q plane.
+
+    Built from per-state means and covariances; the boundary is the LDA one
+    for the pooled covariance, w = S^-1 (mu1 - mu0), placed halfway between
+    the states (equal priors), so both errors count the same.
+    """
+
+    def __init__(self, weights, means, covs, counts, log_lik=None):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.means = np.asarray(means, dtype=np.float64)
+        self.covs = np.asarray(covs, dtype=np.float64)
+        self.counts = np.asarray(counts, dtype=np.float64)
+        self.log_lik = log_lik
+        pooled = self.weights[0] * self.covs[0] + self.weights[1] * self.covs[1]
+        self.w = np.linalg.solve(pooled, self.means[1] - self.means[0])
+        self.b = -float(self.w @ (self.means[0] + self.means[1])) / 2
+        # per-state score distributions along w
+        self.score_mean = self.means @ self.w + self.b
+        self.score_std = np.sqrt(np.einsum('i,kij,j->k', self.w, self.covs, self.w))
+        self.empirical = None
+        self.dip = None
+
+    @classmethod
+    def fit(cls, points, labels=None, chunk=CHUNK):
+        """GMM fit of unlabelled points, or LDA when each point's prepared state (0/1) is known."""
+        if labels is None:
+            weights, means, covs, log_lik = fit_gmm(points, chunk=chunk)
+            disc = cls(weights, means, covs, weights * len(points), log_lik)
+            disc.dip = disc.score_dip(points, chunk)
+            if not disc.separated():
+                raise ValueError(f"IQ points show no two separated states (distance {disc.mahalanobis():.2f}, "
+                                 f"dip {disc.dip:.2f})")
+            return disc
+
+        n, s1, s2 = _moments(
+            points, lambda i, q, start: (np.asarray(labels[start:start + len(i)]) == 1).astype(np.float64), chunk)
+        if n.min() == 0:
+            raise ValueError("labels must contain both states")
+        weights, means, covs = _params(n, s1, s2, 0.0)
+        disc = cls(weights, means, covs, n)
+        disc.empirical = disc.confusion(points, labels, chunk)
+        return disc
+
+    def scores(self, points):
+        """Signed distance-like score; > 0 means state 1."""
+        return np.asarray(points, dtype=np.float64) @ self.w + self.b
+
+    def classify(self, points):
+        return (self.scores(points) > 0).astype(np.int8)
+
+    def classify_point(self, i, q):
+        return int(self.w[0] * i + self.w[1] * q + self.b > 0)
+
+    def confusion(self, points, labels, chunk=CHUNK):
+        """[[n(0->0), n(0->1)], [n(1->0), n(1->1)]] for labelled points."""
+        counts = np.zeros(4, dtype=np.int64)
+        for i in range(0, len(points), chunk):
+            truth = np.asarray(labels[i:i + chunk], dtype=np.int64)
+            counts += np.bincount(truth * 2 + self.classify(points[i:i + chunk]), minlength=4)
+        return counts.reshape(2, 2)
+
+    def error_rates(self):
+        """Model P(1|0), P(0|1) from the fitted Gaussians along w."""
+        p10 = _tail(-self.score_mean[0] / self.score_std[0])
+        p01 = _tail(self.score_mean[1] / self.score_std[1])
+        return p10, p01
+
+    def fidelity(self, z=CONFIDENCE_Z):
+        """(F, low, high). Empirical counts when fitted with labels, else the model rates
+        with intervals for the effective number of points per state."""
+        if self.empirical is not None:
+            n0, n1 = self.empirical.sum(axis=1)
+            e10, e01 = self.empirical[0, 1], self.empirical[1, 0]
+        else:
+            n0, n1 = self.counts
+            p10, p01 = self.error_rates()
+            e10, e01 = p10 * n0, p01 * n1
+        lo10, hi10 = wilson(e10, n0, z)
+        lo01, hi01 = wilson(e01, n1, z)
+        f = 1 - (e10 / max(n0, 1e-12) + e01 / max(n1, 1e-12)) / 2
+        return f, 1 - (hi10 + hi01) / 2, 1 - (lo10 + lo01) / 2
+
+    def separation(self):
+        """Distance between the state means in units of the score spread (readout SNR)."""
+        return float((self.score_mean[1] - self.score_mean[0]) / np.mean(self.score_std))
+
+    def mahalanobis(self):
+        """Distance between the state means in pooled standard deviations."""
+        return float(np.sqrt(self.w @ (self.means[1] - self.means[0])))
+
+    def score_dip(self, points, chunk=CHUNK):
+        """Lowest score density between the state means over the density at the smaller peak.
+
+        Nine bins of (mean1 - mean0) / 8 centred on mean0, the seven steps
+        between and mean1; about 0.64 for equal Gaussian states 3 std apart,
+        >= 1 when the scores have a single peak.
+        """
+        width = (self.score_mean[1] - self.score_mean[0]) / 8
+        if not width > 0:
+            return np.inf
+        edges = self.score_mean[0] + (np.arange(10) - 0.5) * width
+        counts = np.zeros(9)
+        for i in range(0, len(points), chunk):
+            counts += np.histogram(self.scores(points[i:i + chunk]), edges)[0]
+        peak = min(counts[0], counts[8])
+        return counts[1:8].min() / peak if peak else np.inf
+
+    def separated(self):
+        """Whether the fitted components look like two states (see MIN_SEPARATION, MAX_DIP)."""
+        return self.mahalanobis() >= MIN_SEPARATION and (self.dip is None or self.dip <= MAX_DIP)
+
+    def boundary(self):
+        """Two (I, Q) points on the boundary line, e.g. for ax.axline()."""
+        p0 = -self.b * self.w / (self.w @ self.w)
+        return tuple(p0), tuple(p0 + self.w[::-1] * (1, -1))
+
+    def summary(self):
+        f, lo, hi = self.fidelity()
+        return (f"Assignment fidelity: {f * 100:.2f}% [{lo * 100:.2f}, {hi * 100:.2f}] | "
+                f"separation {self.separation():.2f} | states {self.counts[0]:.0f}/{self.counts[1]:.0f}")
+
+
+def main():
+    from Trial_Store import STORE_DIR, TrialStore
+    store = TrialStore(sys.argv[1] if len(sys.argv) > 1 else STORE_DIR)
+    points, _ = store.all_iq()
+    if len(points) < 4:
+        print(f"{store.path}: not enough IQ points ({len(points)})")
+        return
+    try:
+        disc = Discriminator.fit(points)
+    except ValueError as exc:
+        print(f"{store.path}: {exc}")
+        return
+    print(f"{store.path}: {len(points)} IQ points")
+    for k in range(2):
+        print(f"  state {k}: weight {disc.weights[k]:.3f} | mean I={disc.means[k][0]:+.5f} Q={disc.means[k][1]:+.5f}")
+    print(f"  boundary: {disc.w[0]:+.4g}*I {disc.w[1]:+.4g}*Q {disc.b:+.4g} > 0 -> state 1")
+    print("  " + disc.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -3,37 +3,38 @@
 Quantum Readout Analyzer - 5s Accumulate + Plot
 """
 
+import os
 import serial
 import numpy as np
 import matplotlib.pyplot as plt
+import queue
 import sys
+import threading
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from lab_tools import STOP, AdcConverter, MeteredQueue, MultiChannelAcquisition, Stage, StreamFilter, StreamStats
+from IQ_Discriminator import Discriminator
+from Trial_Store import TrialStore, TrialWriter
+
 SERIAL_PORT = "COM3"
 BAUDRATE = 115200
 SAMPLE_RATE = 170000
-BUFFER_LEN = 1024
+BUFFER_LEN = 1024   # samples per channel per read
+N_CHANNELS = 1      # >1: interleaved scan-mode DMA (LAB25 order PA0, PA1, ...)
+CHANNEL = 0         # channel demodulated when N_CHANNELS > 1
 
 F0_TARGET = 5000
 IQ_LEN = 512
 ACCUM_TIME = 5.0  # 5 seconds accumulate
-
-def read_packet(ser):
-    """Read sync-framed packet"""
-    sync = ser.read(2)
-    if len(sync) < 2 or sync != b'\xAA\x55':
-        return None  # wait for sync
-    
-    len_bytes = ser.read(2)
-    if len(len_bytes) < 2:
-        return None
-    
-    pkt_len = (len_bytes[0] << 8) | len_bytes[1]
-    data = ser.read(pkt_len)
-    
-    if len(data) == pkt_len:
-        return np.frombuffer(data, dtype=np.uint16)
-    return None
+BOARD = None      # key in lab_tools/adc_calibration.json, None = nominal scale
+TEST_TONE_HZ = None  # Hz of a known sine on PA0 to measure the real ADC rate, None = off
+SMOOTHING = None     # e.g. dict(kind="iir", order=2, cutoff=(3000, 7000), btype="bandpass", fs=SAMPLE_RATE)
+STATS_FILE = "stream_stats.json"
+STORE_DIR = "trials"   # every trial is saved here (see Trial_Store.py), None = off
+MIN_FIT_POINTS = 32    # session IQ points before the two-state boundary is fitted
+TRIAL_QUEUE = 2        # finished trials waiting for analysis
+PLOT_QUEUE = 2         # analysed trials waiting for the plot
 
 def find_stm32_port():
     import serial.tools.list_ports
@@ -49,6 +50,174 @@ def iq_demod(wave_data, f0=F0_TARGET, fs=SAMPLE_RATE):
     iq = wave_data * carrier
     return np.mean(np.real(iq)), np.mean(np.imag(iq))
 
+def acquire(ser, acq, smoother, stats, trials, stop, live):
+    """Reader thread: back-to-back ACCUM_TIME trials, each queued whole for analysis."""
+    n_bytes = acq.bytes_per_frame(BUFFER_LEN)
+    while not stop.is_set():
+        start_time = time.time()
+        frames = []
+        frame_iq = []
+        ones = 0   # points on the state-1 side of the last fitted boundary
+        n = total = total_sq = peak = 0.0
+        while time.time() - start_time < ACCUM_TIME and not stop.is_set():
+            stats.start_frame()
+            raw = ser.read(n_bytes)
+            stats.lap("read")
+            if len(raw) != n_bytes:
+                continue
+            stats.arrived(BUFFER_LEN * N_CHANNELS, len(raw))
+            voltage = acq.push(raw)[CHANNEL].copy()  # 0-3.3V (no offset); push reuses its buffer
+            codes = acq.codes[CHANNEL]
+            print(f"Fixed ADC range: {codes.min():4d} - {codes.max():4d}")
+
+            if smoother is not None:
+                smoother.reset()   # each read is a separate DMA snapshot
+                smoother.process(voltage, voltage)
+            frames.append(voltage)
+            if TEST_TONE_HZ:
+                stats.tone_frame(voltage, TEST_TONE_HZ)
+            stats.lap("convert")
+
+            # Real-time IQ (last chunk)
+            I, Q = iq_demod(voltage[-IQ_LEN:])
+            frame_iq.append((I, Q))
+            disc = live.get("disc")
+            if disc is not None:
+                ones += disc.classify_point(I, Q)
+            stats.lap("analyze")
+
+            # Live stats (running sums, not a pass over everything accumulated)
+            n += len(voltage)
+            total += float(voltage.sum(dtype=np.float64))
+            total_sq += float(voltage @ voltage)
+            peak = max(peak, float(np.max(np.abs(voltage))))
+            live.update(elapsed=time.time() - start_time, samples=int(n), peak=peak,
+                        rms=np.sqrt(max(total_sq / n - (total / n) ** 2, 0.0)),
+                        p1=ones / len(frame_iq) * 100 if disc is not None else None)
+
+        if stop.is_set():
+            break
+        trial = {
+            "start_time": start_time,
+            "voltage": np.concatenate(frames) if frames else np.empty(0, dtype=np.float32),
+            "iq": np.array(frame_iq, dtype=np.float32).reshape(-1, 2),
+            "stats": stats.snapshot(),   # stats belongs to this thread; the analyzer gets a copy
+        }
+        while not stop.is_set():   # a full queue is dead time; it shows up as the queue's wait
+            try:
+                trials.put(trial, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+    trials.put(STOP)
+
+
+class TrialAnalyzer:
+    """Analysis stage: fidelity, session-wide state boundary, storage."""
+
+    def __init__(self, stats, writer, live):
+        self.stats = stats
+        self.writer = writer
+        self.live = live
+        self.trial_num = 0
+        self.session_iq = np.empty((0, 2), dtype=np.float32)   # every IQ point of this session
+        self.disc = None
+
+    def __call__(self, trial):
+        self.trial_num += 1
+        all_voltage = trial["voltage"]
+        trial_iq = trial["iq"]
+        all_iq = [tuple(p) for p in trial_iq]
+
+        # Final IQ & Fidelity
+        noise_rms = np.std([np.sqrt(I**2 + Q**2) for I, Q in all_iq[:64]])
+        threshold = noise_rms * 3.0
+        amps = [np.sqrt(I**2 + Q**2) for I, Q in all_iq[-32:]]  # last 32 IQs
+        fidelity = np.sum(np.array(amps) > threshold) / len(amps) * 100 if amps else 0
+
+        # Two-state GMM boundary over every IQ point of the session
+        self.session_iq = np.concatenate([self.session_iq, trial_iq])
+        assign = (np.nan, np.nan, np.nan)
+        if len(self.session_iq) >= MIN_FIT_POINTS:
+            try:
+                self.disc = Discriminator.fit(self.session_iq)
+                assign = tuple(v * 100 for v in self.disc.fidelity())
+            except (ValueError, np.linalg.LinAlgError):
+                self.disc = None
+        self.live["disc"] = self.disc
+
+        peak = np.max(np.abs(all_voltage)) if len(all_voltage) else 0.0
+        rms = np.std(all_voltage) if len(all_voltage) else 0.0
+        print(f"\n📊 Trial {self.trial_num} Complete!")
+        print(f"   Total samples: {len(all_voltage)}")
+        print(f"   Noise RMS: {noise_rms:.4f}V, Thresh: {threshold:.4f}V")
+        print(f"   Fidelity: {fidelity:.1f}% ({len(amps)} samples)")
+        print(f"   Peak/RMS: {peak:.3f}V / {rms:.3f}V")
+        if self.disc is not None:
+            print(f"   {self.disc.summary()} ({len(self.session_iq)} session points)")
+        print(self.stats.text(trial["stats"]))
+        self.stats.dump(STATS_FILE, trial["stats"])
+        if self.writer is not None:
+            self.writer.submit(all_voltage, trial_iq,
+                               time=trial["start_time"], duration=ACCUM_TIME, sample_rate=SAMPLE_RATE,
+                               fidelity=fidelity, noise_rms=noise_rms, threshold=threshold,
+                               assign_fidelity=assign[0], assign_low=assign[1], assign_high=assign[2],
+                               peak=peak, rms=rms)
+
+        return {
+            "trial": self.trial_num,
+            "voltage": all_voltage,
+            "iq": trial_iq[-64:],   # last 64 IQ points
+            "fidelity": fidelity,
+            "assign": assign,
+            "disc": self.disc,
+        }
+
+
+class TrialPlot:
+    """One figure, redrawn in place for every analysed trial (no blocking show)."""
+
+    def __init__(self):
+        self.fig, (self.ax1, self.ax2) = plt.subplots(1, 2, figsize=(12, 4))
+        plt.show(block=False)
+
+    def draw(self, result):
+        ax1, ax2 = self.ax1, self.ax2
+        ax1.clear()
+        ax2.clear()
+
+        # Full waveform
+        all_voltage = result["voltage"]
+        t_ms = np.arange(len(all_voltage)) / SAMPLE_RATE * 1000
+        ax1.plot(t_ms, all_voltage)
+        ax1.set_xlabel("Time (ms)")
+        ax1.set_ylabel("Voltage (V)")
+        ax1.grid(True)
+        ax1.set_title(f"STM32 PA0 - Trial {result['trial']} ({ACCUM_TIME}s)")
+
+        # IQ History
+        disc = result["disc"]
+        iq = result["iq"]
+        if len(iq):
+            colors = disc.classify(iq) if disc is not None else None
+            ax2.scatter(iq[:, 0], iq[:, 1], c=colors, cmap='coolwarm', vmin=0, vmax=1, alpha=0.7, s=60)
+            if disc is not None:
+                ax2.axline(*disc.boundary(), color='g', ls='--', lw=1, label='state boundary')
+            ax2.axhline(0, color='k', lw=0.5)
+            ax2.axvline(0, color='k', lw=0.5)
+            ax2.grid(True)
+            ax2.set_xlabel("I")
+            ax2.set_ylabel("Q")
+            title = f"IQ Plane (Fid: {result['fidelity']:.1f}%"
+            if disc is not None:
+                assign = result["assign"]
+                title += f", assign {assign[0]:.1f}% [{assign[1]:.1f}, {assign[2]:.1f}]"
+            ax2.set_title(title + ")")
+
+        self.fig.tight_layout()
+        self.fig.canvas.draw_idle()
+
+
 def main():
     print("=== Quantum Readout Analyzer (5s Accumulate) ===")
     port = find_stm32_port()
@@ -57,97 +226,70 @@ def main():
     ser = serial.Serial(port, BAUDRATE, timeout=1)
     time.sleep(2)
     
-    trial_num = 0
-    
+    # STM32 DMA frames arrive byte-swapped and reversed; keep the 12-bit code
+    adc = AdcConverter(board=BOARD, byte_order='>', reverse=True, mask=0x0FFF)
+    acq = MultiChannelAcquisition(adc, N_CHANNELS, BUFFER_LEN)
+    smoother = StreamFilter(**SMOOTHING) if SMOOTHING else None
+    stats = StreamStats(stages=("read", "convert", "analyze"), nominal_rate=SAMPLE_RATE)   # updated by the reader only
+    writer = TrialWriter(TrialStore(STORE_DIR)) if STORE_DIR else None
+
+    # reader -> trials -> analysis -> results -> plot (main thread, matplotlib)
+    trials = MeteredQueue(TRIAL_QUEUE, "trials")
+    results = MeteredQueue(PLOT_QUEUE, "results")
+    stop = threading.Event()
+    live = {}   # progress for the status line, current state boundary
+    reader = threading.Thread(target=acquire, name="reader", daemon=True,
+                              args=(ser, acq, smoother, stats, trials, stop, live))
+    analyzer = Stage("analysis", TrialAnalyzer(stats, writer, live), trials, results)
+    plot = TrialPlot()
+    reader.start()
+    analyzer.start()
+    print(f"Accumulating back-to-back {ACCUM_TIME}s trials, Ctrl+C to stop")
+
     try:
         while True:
-            adc_data = read_packet(ser)
-            if adc_data is not None:
-                voltage = (adc_data.astype(float) / 4095 * 3.3) - 1.65
-            print("\nWaiting ESP32 'run' command... (5s accumulate)")
-            
-            # Accumulate 5 seconds data
-            start_time = time.time()
-            all_voltage = []
-            all_iq = []
-            
-            while time.time() - start_time < ACCUM_TIME:
-                raw = ser.read(2 * BUFFER_LEN)
-                if len(raw) == 2 * BUFFER_LEN:
-                    # Fix STM32 DMA uint16 endianness + extract 12-bit ADC
-                    adc_raw = np.frombuffer(raw, dtype=np.uint16)
-                    adc_raw = np.flip(adc_raw.byteswap(), 0)  # byte-swap + reverse
-                    adc = adc_raw & 0x0FFF  # extract 12-bit LSB
-                    print(f"Fixed ADC range: {adc.min():4d} - {adc.max():4d}")
-                    
-                    voltage = adc.astype(float) / 4095 * 3.3  # 0-3.3V (no offset)
-                    all_voltage.extend(voltage)
-
-                    
-                    # Real-time IQ (last chunk)
-                    I, Q = iq_demod(voltage[-IQ_LEN:])
-                    all_iq.append((I, Q))
-                
-                # Live stats
-                if len(all_voltage) > 0:
-                    peak = np.max(np.abs(all_voltage))
-                    rms = np.std(all_voltage)
-                    elapsed = time.time() - start_time
-                    print(f"\rAccum: {elapsed:4.1f}s | Peak:{peak:5.3f}V | RMS:{rms:5.3f}V | Samples:{len(all_voltage):6d}", end="")
-            
-            trial_num += 1
-            all_voltage = np.array(all_voltage)
-            
-            # Final IQ & Fidelity
-            amps = [np.sqrt(I**2 + Q**2) for I, Q in all_iq[-32:]]  # last 32 IQs
-            noise_rms = np.std([np.sqrt(I**2 + Q**2) for I, Q in all_iq[:64]])
-            threshold = noise_rms * 3.0
-            amps = [np.sqrt(I**2 + Q**2) for I, Q in all_iq[-32:]]
-            fidelity = np.sum(np.array(amps) > threshold) / len(amps) * 100 if amps else 0
-
-            print(f"\n📊 Trial {trial_num} Complete!")
-            print(f"   Noise RMS: {noise_rms:.4f}V, Thresh: {threshold:.4f}V")
-            print(f"   Fidelity: {fidelity:.1f}% (32 samples)")
-            print(f"   Peak/RMS: {np.max(np.abs(all_voltage)):.3f}V / {np.std(all_voltage):.3f}V")
-            print(f"\n📊 Trial {trial_num} Complete!")
-            print(f"   Total samples: {len(all_voltage)}")
-            print(f"   Fidelity: {fidelity:.1f}%")
-            print(f"   Peak/RMS: {np.max(np.abs(all_voltage)):.3f}V / {np.std(all_voltage):.3f}V")
-            
-            # Plot (only once per trial)
-            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 4))
-            
-            # Full waveform
-            t_ms = np.arange(len(all_voltage)) / SAMPLE_RATE * 1000
-            ax1.plot(t_ms, all_voltage)
-            ax1.set_xlabel("Time (ms)")
-            ax1.set_ylabel("Voltage (V)")
-            ax1.grid(True)
-            ax1.set_title(f"STM32 PA0 - {ACCUM_TIME}s Accumulate")
-            
-            # IQ History
-            if all_iq:
-                I_hist = [p[0] for p in all_iq[-64:]]  # last 64 IQ points
-                Q_hist = [p[1] for p in all_iq[-64:]]
-                ax2.scatter(I_hist, Q_hist, alpha=0.7, s=60)
-                ax2.axhline(0, color='k', lw=0.5)
-                ax2.axvline(0, color='k', lw=0.5)
-                ax2.grid(True)
-                ax2.set_xlabel("I")
-                ax2.set_ylabel("Q")
-                ax2.set_title(f"IQ Plane (Fid: {fidelity:.1f}%)")
-            
-            plt.tight_layout()
-            plt.show(block=False)
-            plt.pause(2)  # show 2 seconds
-            plt.close()
-            
-            print("Ready for next ESP32 'run'...")
+            try:
+                result = results.get(timeout=0.1)
+            except queue.Empty:
+                result = None
+            if result is STOP:
+                break
+            if result is not None:
+                plot.draw(result)
+                print(trials.text())
+                print(results.text())
+                print(f"analysis busy {analyzer.utilisation() * 100:.0f}%"
+                      + (f" | writer pending {writer.pending()}" if writer is not None else ""))
+                print("Ready for next ESP32 'run'...")
+            if analyzer.error is not None:
+                raise analyzer.error
+
+            # Live stats
+            if live.get("samples"):
+                state = f" | P1:{live['p1']:5.1f}%" if live.get("p1") is not None else ""
+                print(f"\rAccum: {live['elapsed']:4.1f}s | Peak:{live['peak']:5.3f}V | RMS:{live['rms']:5.3f}V | "
+                      f"Samples:{live['samples']:6d}{state}", end="")
+            plt.pause(0.05)
     
     except KeyboardInterrupt:
         print("\nStopped")
     finally:
+        stop.set()
+        # Keep taking results, or the analyzer can block forever on a full
+        # queue; it finishes the queued trials and exits on the reader's STOP
+        deadline = time.monotonic() + 10
+        while analyzer.is_alive() and time.monotonic() < deadline:
+            try:
+                results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        reader.join(timeout=2)
+        analyzer.join(timeout=1)
         ser.close()
+        acq.close()
+        if writer is not None:
+            writer.close()
+            print(f"Saved {writer.written} trials to {STORE_DIR}/")
 
 if __name__ == "__main__":
     main()
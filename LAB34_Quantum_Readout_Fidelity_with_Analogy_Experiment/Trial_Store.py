@@ -0,0 +1,216 @@
+"""
+Persistent store for LAB34 readout trials.
+
+A store is a directory of append-only files:
+
+    voltage.f32   raw voltage of every trial, float32, back to back
+    iq.f32        IQ points of every trial, float32 (I, Q) pairs
+    index.bin     one fixed-size INDEX_DTYPE record per trial
+
+The index holds the offsets into the data files plus the summary metrics, so
+queries across thousands of trials (fidelity vs time, threshold drift) read a
+few kB with np.fromfile and never touch the raw data. A record is appended
+only after its data is on disk, so a killed session leaves a valid store.
+
+TrialWriter does the writing in a background thread; the acquisition loop
+only hands over arrays it no longer uses.
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+
+# --- Configuration ---
+STORE_DIR = "trials"
+QUEUE_TRIALS = 8        # trials waiting for the disk before submit() blocks
+# ---------------------
+
+INDEX_DTYPE = np.dtype([
+    ("trial", "<i8"),
+    ("time", "<f8"),            # unix time at the start of the accumulation
+    ("duration", "<f4"),        # s
+    ("sample_rate", "<f4"),     # Hz
+    ("voltage_start", "<i8"),   # offset into voltage.f32 (samples)
+    ("voltage_count", "<i8"),
+    ("iq_start", "<i8"),        # offset into iq.f32 (points)
+    ("iq_count", "<i8"),
+    ("fidelity", "<f4"),        # %
+    ("noise_rms", "<f4"),       # V
+    ("threshold", "<f4"),       # V
+    ("peak", "<f4"),            # V
+    ("rms", "<f4"),             # V
+    ("assign_fidelity", "<f4"), # %, two-state boundary over the session so far (NaN before the first fit)
+    ("assign_low", "<f4"),      # %, confidence interval
+    ("assign_high", "<f4"),
+])
+
+
+class TrialStore:
+    """Append and query trials in a store directory (created if missing)."""
+
+    def __init__(self, path=STORE_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.voltage_path = os.path.join(path, "voltage.f32")
+        self.iq_path = os.path.join(path, "iq.f32")
+        self.index_path = os.path.join(path, "index.bin")
+        for p in (self.voltage_path, self.iq_path, self.index_path):
+            open(p, "ab").close()
+        self._repair()
+
+    def _repair(self):
+        """Drop a partially written last record and any data it doesn't cover."""
+        size = os.path.getsize(self.index_path)
+        if size % INDEX_DTYPE.itemsize:
+            with open(self.index_path, "r+b") as f:
+                f.truncate(size - size % INDEX_DTYPE.itemsize)
+        index = self.index()
+        v_end = int(index["voltage_start"][-1] + index["voltage_count"][-1]) if len(index) else 0
+        iq_end = int(index["iq_start"][-1] + index["iq_count"][-1]) if len(index) else 0
+        for p, end, width in ((self.voltage_path, v_end, 4), (self.iq_path, iq_end, 8)):
+            if os.path.getsize(p) > end * width:
+                with open(p, "r+b") as f:
+                    f.truncate(end * width)
+        self.voltage_end = v_end
+        self.iq_end = iq_end
+        self.next_trial = int(index["trial"][-1]) + 1 if len(index) else 1
+
+    def __len__(self):
+        return os.path.getsize(self.index_path) // INDEX_DTYPE.itemsize
+
+    def append(self, voltage, iq, **metrics):
+        """Write one trial; metrics are INDEX_DTYPE fields (trial defaults to the next number)."""
+        voltage = np.ascontiguousarray(voltage, dtype=np.float32).ravel()
+        iq = np.ascontiguousarray(iq, dtype=np.float32).reshape(-1, 2)
+        with open(self.voltage_path, "ab") as f:
+            voltage.tofile(f)
+        with open(self.iq_path, "ab") as f:
+            iq.tofile(f)
+
+        record = np.zeros(1, dtype=INDEX_DTYPE)
+        for name, value in metrics.items():
+            record[name] = value
+        if "trial" not in metrics:
+            record["trial"] = self.next_trial
+        record["voltage_start"] = self.voltage_end
+        record["voltage_count"] = len(voltage)
+        record["iq_start"] = self.iq_end
+        record["iq_count"] = len(iq)
+        with open(self.index_path, "ab") as f:
+            record.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.voltage_end += len(voltage)
+        self.iq_end += len(iq)
+        self.next_trial = int(record["trial"][0]) + 1
+        return int(record["trial"][0])
+
+    def index(self):
+        """All index records as a structured array (columns by name: index()["fidelity"])."""
+        return np.fromfile(self.index_path, dtype=INDEX_DTYPE)
+
+    def _row(self, trial):
+        index = self.index()
+        rows = np.flatnonzero(index["trial"] == trial)
+        if not len(rows):
+            raise KeyError(f"no trial {trial} in {self.path}")
+        return index[rows[-1]]
+
+    def voltage(self, trial):
+        """Raw voltage of one trial, memory-mapped (nothing is read until used)."""
+        row = self._row(trial)
+        if row["voltage_count"] == 0:
+            return np.empty(0, dtype=np.float32)
+        return np.memmap(self.voltage_path, dtype=np.float32, mode="r",
+                         offset=int(row["voltage_start"]) * 4, shape=(int(row["voltage_count"]),))
+
+    def iq(self, trial):
+        """(n, 2) IQ points of one trial."""
+        row = self._row(trial)
+        return np.fromfile(self.iq_path, dtype=np.float32, count=int(row["iq_count"]) * 2,
+                           offset=int(row["iq_start"]) * 8).reshape(-1, 2)
+
+    def all_iq(self):
+        """Every IQ point in the store as (n, 2), memory-mapped, plus the trial of each point."""
+        index = self.index()
+        n = self.iq_end
+        if n == 0:
+            return np.empty((0, 2), dtype=np.float32), np.empty(0, dtype=np.int64)
+        points = np.memmap(self.iq_path, dtype=np.float32, mode="r", shape=(n, 2))
+        trial = np.repeat(index["trial"], index["iq_count"])
+        return points, trial
+
+
+class TrialWriter:
+    """Writes trials to a TrialStore from a background thread.
+
+    submit() only queues references to the arrays, so the caller must not
+    modify them afterwards. If the disk falls QUEUE_TRIALS trials behind,
+    submit() blocks rather than dropping data.
+    """
+
+    def __init__(self, store, max_pending=QUEUE_TRIALS):
+        self.store = store
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.written = 0
+        self.write_time = 0.0
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name="trial-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, voltage, iq, **metrics):
+        if self.error is not None:
+            raise RuntimeError("trial writer failed") from self.error
+        self.queue.put((voltage, iq, metrics))
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            t0 = time.perf_counter()
+            try:
+                self.store.append(item[0], item[1], **item[2])
+                self.written += 1
+            except Exception as exc:   # surfaced by the next submit()
+                self.error = exc
+            self.write_time += time.perf_counter() - t0
+            self.queue.task_done()
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def close(self):
+        """Write what is queued, then stop the thread."""
+        self.queue.put(None)
+        self.thread.join()
+
+
+def main():
+    store = TrialStore(sys.argv[1] if len(sys.argv) > 1 else STORE_DIR)
+    index = store.index()
+    if not len(index):
+        print(f"{store.path}: no trials")
+        return
+    print(f"{store.path}: {len(index)} trials, {store.voltage_end} samples, {store.iq_end} IQ points")
+    print(" trial  time                 fidelity%  assign%  threshold V  noise_rms V    peak V")
+    for row in index[-20:]:
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["time"]))
+        print(f"{row['trial']:6d}  {stamp}  {row['fidelity']:9.1f}  {row['assign_fidelity']:7.1f}  {row['threshold']:11.4f}"
+              f"  {row['noise_rms']:11.4f}  {row['peak']:8.3f}")
+    if len(index) > 1:
+        hours = (index["time"] - index["time"][0]) / 3600.0
+        if np.ptp(hours) > 0:
+            drift = np.polyfit(hours, index["threshold"], 1)[0]
+            print(f"Threshold drift: {drift * 1000:+.3f} mV/hour over {np.ptp(hours):.2f} h")
+        print(f"Fidelity: mean {index['fidelity'].mean():.1f}% | min {index['fidelity'].min():.1f}% "
+              f"| max {index['fidelity'].max():.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import glob
+import os
+import sys
+import numpy as np
+
+# --- Configuration (matches the Edge Impulse impulse) ---
+SAMPLE_RATE = 50        # Hz
+WINDOW_SIZE = 100       # samples, 2000 ms window
+WINDOW_STEP = 4         # samples, 80 ms window increase (live)
+EXPORT_STEP = 50        # samples, 50 % overlap for the training set
+N_BANDS = 8             # spectral power bands per axis
+AXES = ("accX", "accY", "accZ")
+# ---------------------
+
+
+def feature_names(axes=AXES, n_bands=N_BANDS):
+    names = []
+    for a in axes:
+        names += [f"{a}_mean", f"{a}_rms", f"{a}_zero_cross"]
+        names += [f"{a}_band{b}" for b in range(n_bands)]
+    for i in range(len(axes)):
+        for j in range(i + 1, len(axes)):
+            names.append(f"corr_{axes[i]}_{axes[j]}")
+    return names
+
+
+class WindowFeatures:
+    """Vectorized features for a batch of windows shaped (streams, window, axes)."""
+
+    def __init__(self, window=WINDOW_SIZE, n_bands=N_BANDS, n_axes=len(AXES)):
+        self.window = window
+        self.n_axes = n_axes
+        self.taper = np.hanning(window).astype(np.float32)[:, None]
+        self.taper_power = float(np.sum(self.taper ** 2))
+        # Equal-width bands over the rfft bins, DC excluded
+        n_bins = window // 2 + 1
+        self.band_edges = np.linspace(1, n_bins, n_bands + 1).astype(int)[:-1]
+        self.upper = np.triu_indices(n_axes, k=1)
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        mean = x.mean(axis=1)
+        xc = x - mean[:, None, :]
+
+        rms = np.sqrt(np.mean(xc ** 2, axis=1))
+        zero_cross = np.count_nonzero(np.diff(np.signbit(xc), axis=1), axis=1).astype(np.float32)
+
+        spectrum = np.fft.rfft(xc * self.taper, axis=1)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2) / self.taper_power
+        bands = np.add.reduceat(power, self.band_edges, axis=1)   # (S, bands, A)
+
+        cov = np.einsum('swa,swb->sab', xc, xc) / self.window
+        std = np.sqrt(np.diagonal(cov, axis1=1, axis2=2))
+        corr = cov / (std[:, :, None] * std[:, None, :] + 1e-12)
+        corr = corr[:, self.upper[0], self.upper[1]]
+
+        per_axis = np.concatenate([mean[:, None], rms[:, None], zero_cross[:, None], bands], axis=1)
+        per_axis = per_axis.transpose(0, 2, 1).reshape(len(x), -1)   # axis-major, as feature_names()
+        return np.concatenate([per_axis, corr], axis=1).astype(np.float32)
+
+
+class StreamingFeatures:
+    """Overlapping-window features for many synchronous sensor streams.
+
+    Samples go into a doubled ring buffer, so the latest window is always one
+    contiguous slice and nothing is copied per step. push() returns an array
+    shaped (emitted_windows, streams, features).
+    """
+
+    def __init__(self, n_streams=1, window=WINDOW_SIZE, step=WINDOW_STEP, n_bands=N_BANDS, n_axes=len(AXES)):
+        self.n_streams = n_streams
+        self.window = window
+        self.step = step
+        self.features = WindowFeatures(window, n_bands, n_axes)
+        self.n_features = n_axes * (3 + n_bands) + n_axes * (n_axes - 1) // 2
+        self.ring = np.zeros((n_streams, 2 * window, n_axes), dtype=np.float32)
+        self.pos = 0
+        self.filled = 0
+        self.since_emit = 0
+
+    def push(self, samples):
+        """samples: (streams, k, axes) or (k, axes) for a single stream."""
+        samples = np.asarray(samples, dtype=np.float32)
+        if samples.ndim == 2:
+            samples = samples[None]
+        out = []
+        i = 0
+        while i < samples.shape[1]:
+            # write up to the next emit point in one vectorized copy
+            m = min(samples.shape[1] - i, self.step - self.since_emit, self.window)
+            idx = (self.pos + np.arange(m)) % self.window
+            self.ring[:, idx] = samples[:, i:i + m]
+            self.ring[:, idx + self.window] = samples[:, i:i + m]
+            self.pos = (self.pos + m) % self.window
+            self.filled = min(self.filled + m, self.window)
+            self.since_emit += m
+            i += m
+
+            if self.since_emit >= self.step:
+                self.since_emit = 0
+                if self.filled == self.window:
+                    out.append(self.features(self.ring[:, self.pos:self.pos + self.window]))
+
+        if not out:
+            return np.empty((0, self.n_streams, self.n_features), dtype=np.float32)
+        return np.stack(out)
+
+
+def extract_windows(windows, window=WINDOW_SIZE, step=WINDOW_STEP, n_bands=N_BANDS):
+    """Features for every overlapping window of recorded (N, samples, axes) clips."""
+    windows = np.asarray(windows, dtype=np.float32)
+    starts = np.arange(0, windows.shape[1] - window + 1, step)
+    frames = np.lib.stride_tricks.sliding_window_view(windows, window, axis=1)[:, starts]
+    frames = frames.transpose(0, 1, 3, 2).reshape(-1, window, windows.shape[2])
+    return WindowFeatures(window, n_bands, windows.shape[2])(frames)
+
+
+def main():
+    # Usage: python IMU_Features.py stirring_windows [idle_windows ...]
+    for folder in sys.argv[1:] or glob.glob("*_windows"):
+        paths = sorted(glob.glob(os.path.join(folder, "*.csv")))
+        if not paths:
+            continue
+        clips = np.stack([np.loadtxt(p, delimiter=',', skiprows=1, dtype=np.float32)[:, 1:] for p in paths])
+        features = extract_windows(clips, step=EXPORT_STEP)
+        out = folder.rstrip("/\\").removesuffix("_windows") + "_features.npz"
+        np.savez_compressed(out, features=features, names=np.array(feature_names()))
+        print(f"{folder}: {clips.size} raw values -> {features.size} features ({out})")
+
+
+if __name__ == "__main__":
+    main()
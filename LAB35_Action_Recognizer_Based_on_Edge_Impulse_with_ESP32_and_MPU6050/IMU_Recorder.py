@@ -0,0 +1,189 @@
+import os
+import time
+import numpy as np
+import serial
+
+# --- Configuration ---
+SERIAL_PORT = 'COM#'
+BAUD_RATE = 115200
+LABEL = "stirring"          # Edge Impulse label, also used for file names
+DURATION = 10.0             # seconds, None = record until Ctrl+C
+SAMPLE_RATE = 50            # Hz, ESP32 sends one line every 20 ms
+WINDOW_SECONDS = 10.0       # length of each labeled window for upload
+GAP_FACTOR = 1.5            # an interval > 1.5 periods counts as late/dropped
+MAX_GAP = 0.1               # s, don't interpolate across longer holes
+BATCH_SIZE = 250            # raw samples per file write
+# ---------------------
+
+PERIOD = 1.0 / SAMPLE_RATE
+
+
+def parse_lines(lines):
+    """Parse b'accX,accY,accZ' lines; return (N x 3 float32 array, valid mask)."""
+    valid = np.array([line.count(b',') == 2 for line in lines], dtype=bool)
+    good = [line for line, ok in zip(lines, valid) if ok]
+    try:
+        values = np.array(b','.join(good).split(b','), dtype=np.float32) if good else np.empty(0, np.float32)
+    except ValueError:
+        # a corrupted number somewhere in the batch: fall back to line-by-line
+        rows = []
+        for i, line in enumerate(lines):
+            if not valid[i]:
+                continue
+            try:
+                rows.append([float(v) for v in line.split(b',')])
+            except ValueError:
+                valid[i] = False
+        values = np.array(rows, dtype=np.float32).ravel()
+    values = values.reshape(-1, 3)
+    finite = np.isfinite(values).all(axis=1)
+    valid[np.flatnonzero(valid)[~finite]] = False
+    return values[finite], valid
+
+
+def stamp_lines(count, t_arrival, t_previous, period=PERIOD):
+    """Host timestamps for `count` lines that arrived together at t_arrival.
+
+    The last line gets the arrival time; earlier lines of the same read are
+    spaced back by the nominal period, but never before the previous read.
+    """
+    stamps = t_arrival - period * np.arange(count - 1, -1, -1)
+    return np.maximum(stamps, t_previous)
+
+
+def detect_gaps(stamps, period=PERIOD, factor=GAP_FACTOR):
+    """Find late/dropped samples from arrival-time gaps."""
+    dt = np.diff(stamps)
+    late = np.flatnonzero(dt > factor * period)
+    dropped = int(np.sum(np.round(dt[late] / period) - 1))
+    return {
+        "late": len(late),
+        "dropped": max(dropped, 0),
+        "gap_index": late,
+        "max_gap_ms": float(dt.max() * 1000) if len(dt) else 0.0,
+    }
+
+
+def resample_uniform(stamps, values, rate=SAMPLE_RATE, max_gap=MAX_GAP):
+    """Linearly resample (stamps, values) onto an exact `rate` Hz grid.
+
+    Grid points that fall inside a hole longer than max_gap are set to NaN.
+    """
+    grid = stamps[0] + np.arange(int((stamps[-1] - stamps[0]) * rate) + 1) / rate
+    out = np.empty((len(grid), values.shape[1]), dtype=np.float32)
+    for axis in range(values.shape[1]):
+        out[:, axis] = np.interp(grid, stamps, values[:, axis])
+
+    right = np.clip(np.searchsorted(stamps, grid), 1, len(stamps) - 1)
+    hole = (stamps[right] - stamps[right - 1]) > max_gap
+    out[hole] = np.nan
+    return grid, out
+
+
+def segment_windows(values, rate=SAMPLE_RATE, window_seconds=WINDOW_SECONDS):
+    """Split resampled data into full-length windows, skipping ones with holes."""
+    size = int(round(window_seconds * rate))
+    n = len(values) // size
+    windows = values[:n * size].reshape(n, size, values.shape[1])
+    complete = ~np.isnan(windows).any(axis=(1, 2))
+    return windows[complete], int(n - complete.sum())
+
+
+def write_windows(windows, label=LABEL, rate=SAMPLE_RATE, out_dir=None):
+    """Write one Edge Impulse CSV per window: timestamp(ms),accX,accY,accZ."""
+    out_dir = out_dir or f"{label}_windows"
+    os.makedirs(out_dir, exist_ok=True)
+    t_ms = (np.arange(windows.shape[1]) * 1000 / rate).reshape(-1, 1)
+    paths = []
+    for i, window in enumerate(windows):
+        path = os.path.join(out_dir, f"{label}.{i:04d}.csv")
+        np.savetxt(path, np.hstack([t_ms, window]), delimiter=',', fmt=['%d', '%.2f', '%.2f', '%.2f'],
+                   header="timestamp,accX,accY,accZ", comments='')
+        paths.append(path)
+    return paths
+
+
+def record(ser, raw_file, duration=DURATION):
+    """Read until duration/Ctrl+C; return host-stamped (stamps, values)."""
+    stamp_chunks, value_chunks = [], []
+    batch_t, batch_v = [], []
+    pending = b''
+    t_previous = -np.inf
+    invalid = 0
+    start = time.monotonic()
+
+    def flush():
+        if batch_t:
+            t = np.concatenate(batch_t)
+            v = np.concatenate(batch_v)
+            np.savetxt(raw_file, np.column_stack([(t - start) * 1000, v]), delimiter=',', fmt='%.2f')
+            batch_t.clear()
+            batch_v.clear()
+
+    try:
+        while duration is None or time.monotonic() - start < duration:
+            chunk = ser.read(ser.in_waiting or 1)
+            t_arrival = time.monotonic()
+            if not chunk:
+                continue
+            pending += chunk
+            lines = pending.split(b'\n')
+            pending = lines.pop()
+            lines = [line.strip() for line in lines if line.strip()]
+            if not lines:
+                continue
+
+            values, valid = parse_lines(lines)
+            invalid += int((~valid).sum())
+            if len(values) == 0:
+                continue
+            stamps = stamp_lines(len(values), t_arrival, t_previous)
+            t_previous = stamps[-1]
+
+            stamp_chunks.append(stamps)
+            value_chunks.append(values)
+            batch_t.append(stamps)
+            batch_v.append(values)
+            if sum(len(b) for b in batch_t) >= BATCH_SIZE:
+                flush()
+    except KeyboardInterrupt:
+        print("\nStopped by user.")
+    finally:
+        flush()
+
+    if not stamp_chunks:
+        return np.empty(0), np.empty((0, 3), np.float32), invalid
+    return np.concatenate(stamp_chunks), np.concatenate(value_chunks), invalid
+
+
+def main():
+    ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=0.05)
+    raw_name = f"{LABEL}_raw.csv"
+    try:
+        with open(raw_name, "w") as f:
+            f.write("host_ms,accX,accY,accZ\n")
+            print(f"Recording into {raw_name}...")
+            stamps, values, invalid = record(ser, f)
+    finally:
+        ser.close()
+
+    if len(stamps) < 2:
+        print("No data was captured.")
+        return
+
+    gaps = detect_gaps(stamps)
+    span = stamps[-1] - stamps[0]
+    print(f"Samples: {len(stamps)} in {span:.1f}s ({(len(stamps) - 1) / span:.1f} Hz) | "
+          f"invalid lines: {invalid} | late: {gaps['late']} | "
+          f"dropped (est.): {gaps['dropped']} | max gap: {gaps['max_gap_ms']:.0f} ms")
+
+    _, grid_values = resample_uniform(stamps, values)
+    windows, skipped = segment_windows(grid_values)
+    paths = write_windows(windows)
+    print(f"Wrote {len(paths)} x {WINDOW_SECONDS:.0f}s windows at {SAMPLE_RATE} Hz "
+          f"({skipped} skipped because of gaps).")
+    print("Complete the Record！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import time
+import numpy as np
+
+# --- Configuration ---
+READ_TIMEOUT = 0.05     # s, serial read blocks at most this long (no busy loop)
+CHUNK_ROWS = 65536      # rows per storage chunk
+LIVE_CHUNKS = 4         # chunks kept in memory during a capture (the files keep everything)
+STATUS_HZ = 2           # status line refresh rate
+COLUMNS = ["PWM_Duty", "Feedback_ADC", "Load_Sense_ADC"]
+# ---------------------
+
+
+class ColumnStore:
+    """Chunked, growable float32 columnar store.
+
+    Rows are copied into fixed-size chunks, so appending never reallocates
+    what is already stored and each sample costs 4 bytes per column instead
+    of a Python float object per list entry. With max_chunks set, only the
+    newest chunks are kept in memory (the CSV still has everything).
+    """
+
+    def __init__(self, n_cols=len(COLUMNS), chunk_rows=CHUNK_ROWS, max_chunks=None):
+        self.n_cols = n_cols
+        self.chunk_rows = chunk_rows
+        self.max_chunks = max_chunks
+        self.chunks = []
+        self.fill = chunk_rows   # forces a new chunk on first append
+        self.total = 0           # rows ever appended
+        self.dropped = 0         # rows released because of max_chunks
+
+    def __len__(self):
+        return self.total - self.dropped
+
+    def append(self, rows):
+        rows = np.asarray(rows, dtype=np.float32).reshape(-1, self.n_cols)
+        i = 0
+        while i < len(rows):
+            if self.fill == self.chunk_rows:
+                self.chunks.append(np.empty((self.chunk_rows, self.n_cols), dtype=np.float32))
+                self.fill = 0
+                if self.max_chunks and len(self.chunks) > self.max_chunks:
+                    self.chunks.pop(0)
+                    self.dropped += self.chunk_rows
+            m = min(len(rows) - i, self.chunk_rows - self.fill)
+            self.chunks[-1][self.fill:self.fill + m] = rows[i:i + m]
+            self.fill += m
+            i += m
+        self.total += len(rows)
+
+    def iter_chunks(self):
+        """Yield filled views of each chunk, oldest first, without copying."""
+        for chunk in self.chunks[:-1]:
+            yield chunk
+        if self.chunks:
+            yield self.chunks[-1][:self.fill]
+
+    def column(self, index):
+        """One column as a contiguous array (copies)."""
+        if not self.chunks:
+            return np.empty(0, dtype=np.float32)
+        return np.concatenate([c[:, index] for c in self.iter_chunks()])
+
+    def last(self):
+        return self.chunks[-1][self.fill - 1] if self.total else None
+
+
+def parse_batch(lines, n_cols=len(COLUMNS)):
+    """Parse b'a,b,c' lines into an (N, n_cols) float32 array, skipping bad ones."""
+    good = [line for line in lines if line.count(b',') == n_cols - 1]
+    if not good:
+        return np.empty((0, n_cols), dtype=np.float32)
+    try:
+        return np.array(b','.join(good).split(b','), dtype=np.float32).reshape(-1, n_cols)
+    except ValueError:
+        rows = []
+        for line in good:
+            try:
+                rows.append([float(v) for v in line.split(b',')])
+            except ValueError:
+                continue
+        return np.array(rows, dtype=np.float32).reshape(-1, n_cols)
+
+
+class CaptureEngine:
+    """Block-reading serial capture: parse, store, write CSV, report status."""
+
+    def __init__(self, ser, csv_file=None, store=None, on_marker=None, raw_file=None):
+        self.ser = ser
+        self.csv_file = csv_file
+        self.raw_file = raw_file     # optional binary float32 copy of every row
+        self.store = store if store is not None else ColumnStore(max_chunks=LIVE_CHUNKS)
+        self.on_marker = on_marker   # called with (comment line, absolute row index)
+        self.pending = b''
+        self.bad_lines = 0
+        self.sweeps = 0
+        self.next_status = 0.0
+
+    def poll(self):
+        """Read whatever arrived (blocking up to the port timeout); return new rows."""
+        chunk = self.ser.read(max(self.ser.in_waiting, 1))
+        if not chunk:
+            return np.empty((0, self.store.n_cols), dtype=np.float32)
+
+        self.pending += chunk
+        lines = self.pending.split(b'\n')
+        self.pending = lines.pop()
+
+        # Rows are stored segment by segment so a marker line gets the exact
+        # absolute row index at which it arrived
+        new_rows = []
+        data = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith(b'#'):
+                new_rows.append(self._store(data))
+                data = []
+                self._marker(line.decode('utf-8', errors='ignore'), self.store.total)
+                continue
+            data.append(line)
+        new_rows.append(self._store(data))
+        return np.concatenate(new_rows)
+
+    def _store(self, data):
+        rows = parse_batch(data, self.store.n_cols)
+        self.bad_lines += len(data) - len(rows)
+        if len(rows):
+            self.store.append(rows)
+            if self.csv_file is not None:
+                np.savetxt(self.csv_file, rows, delimiter=',', fmt='%g')
+            if self.raw_file is not None:
+                rows.tofile(self.raw_file)
+        return rows
+
+    def _marker(self, line, row_index):
+        if "Starting New Sweep" in line:
+            self.sweeps += 1
+            print(f"\n>>> Status: New Sweep Detected... (#{self.sweeps})")
+        if self.on_marker is not None:
+            self.on_marker(line, row_index)
+
+    def print_status(self, force=False):
+        now = time.monotonic()
+        if not force and now < self.next_status:
+            return
+        self.next_status = now + 1.0 / STATUS_HZ
+        last = self.store.last()
+        if last is None:
+            return
+        pwm, v_fb, l_sn = last[:3]
+        print(f"Recording: PWM={pwm:>3.0f} | V_FB={v_fb:>7.2f} | L_Sense={l_sn:>7.2f} "
+              f"| Samples={self.store.total:>9d}", end='\r')
+
+    def run(self):
+        """Capture until Ctrl+C."""
+        while True:
+            self.poll()
+            self.print_status()
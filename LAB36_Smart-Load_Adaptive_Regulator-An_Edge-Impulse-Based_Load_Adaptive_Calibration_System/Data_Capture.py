@@ -1,61 +1,60 @@
 import serial
-import csv
 import matplotlib.pyplot as plt
 import time
+from Capture_Engine import COLUMNS, LIVE_CHUNKS, READ_TIMEOUT, CaptureEngine, ColumnStore
+from Sweep_Dataset import INDEX_FILE, RAW_FILE, SweepIndex, load_capture
+from Density_Plot import DensityGrid, DensityPlot
 
 # --- Configuration ---
 # check your COM port in Arduino IDE
 SERIAL_PORT = 'COM#'  
 BAUD_RATE = 115200
 SAVE_FILE = "training_data.csv"
+PLOT_MODE = "density"   # "density" (2-D histogram) or "scatter" (every point, slow for long runs)
+LIVE_PLOT = False       # update the density plot while capturing
+LIVE_PLOT_HZ = 1
 # ---------------------
 
 def main():
-    # Initialize lists OUTSIDE the try block to avoid UnboundLocalError
-    pwm_list = []
-    feedback_list = []
-    load_sense_list = []
+    # Only the newest samples stay in memory (see Capture_Engine.py); the full
+    # history is in the CSV and the binary copy, the plot uses the density grid
+    store = ColumnStore(max_chunks=LIVE_CHUNKS)
+    grid = DensityGrid()
     ser = None
 
     try:
         # Initialize Serial Connection
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
+        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=READ_TIMEOUT)
         time.sleep(2)  # Wait for connection to stabilize
         
         print(f"Success: Connected to {SERIAL_PORT}")
         print("Instructions: Adjust your potentiometer and let the ESP32 complete the sweeps.")
         print("Action: Press 'Ctrl+C' to stop recording and generate the graph.")
 
+        if LIVE_PLOT:
+            plt.ion()
+            live = DensityPlot(grid)
+            next_refresh = 0.0
+
+        # Binary copy + sweep index let Sweep_Dataset.py rebuild the training set quickly
+        sweep_index = SweepIndex(INDEX_FILE)
+
         # Create CSV and write header
-        with open(SAVE_FILE, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(["PWM_Duty", "Feedback_ADC", "Load_Sense_ADC"])
+        with open(SAVE_FILE, 'w', newline='') as f, open(RAW_FILE, 'wb') as raw:
+            f.write(",".join(COLUMNS) + "\n")
 
-            while True:
-                if ser.in_waiting > 0:
-                    line = ser.readline().decode('utf-8', errors='ignore').strip()
-                    
-                    if not line or line.startswith('#'):
-                        if "Starting New Sweep" in line:
-                            print("\n>>> Status: New Sweep Detected...")
-                        continue
-                    
-                    try:
-                        parts = line.split(',')
-                        if len(parts) == 3:
-                            pwm = float(parts[0])
-                            v_fb = float(parts[1])
-                            l_sn = float(parts[2])
-                            
-                            writer.writerow([pwm, v_fb, l_sn])
-                            
-                            pwm_list.append(pwm)
-                            feedback_list.append(v_fb)
-                            load_sense_list.append(l_sn)
-                            
-                            print(f"Recording: PWM={pwm:>3.0f} | V_FB={v_fb:>7.2f} | L_Sense={l_sn:>7.2f}", end='\r')
-                    except ValueError:
-                        continue
+            engine = CaptureEngine(ser, csv_file=f, store=store, on_marker=sweep_index, raw_file=raw)
+            try:
+                while True:
+                    rows = engine.poll()
+                    engine.print_status()
+                    if len(rows):
+                        grid.add(rows[:, 0], rows[:, 1], rows[:, 2])
+                    if LIVE_PLOT and time.monotonic() >= next_refresh:
+                        live.refresh()
+                        next_refresh = time.monotonic() + 1.0 / LIVE_PLOT_HZ
+            finally:
+                sweep_index.close()
 
     except KeyboardInterrupt:
         print("\n\nProcess: Collection stopped by user.")
@@ -67,15 +66,20 @@ def main():
             ser.close()
         
         # --- Visualization Section ---
-        if len(pwm_list) > 0:
-            print(f"Summary: Captured {len(pwm_list)} samples. Generating plots...")
-            plt.figure(figsize=(10, 6))
-            scatter = plt.scatter(pwm_list, feedback_list, c=load_sense_list, cmap='plasma', s=15)
-            plt.colorbar(scatter).set_label('Load_Sense_ADC')
-            plt.title('V-Feedback vs PWM (Multiple Loads)')
-            plt.xlabel('PWM Duty')
-            plt.ylabel('Feedback ADC')
-            plt.grid(True)
+        if store.total > 0:
+            print(f"Summary: Captured {store.total} samples. Generating plots...")
+            plt.ioff()
+            if PLOT_MODE == "density":
+                DensityPlot(grid).refresh()
+            else:
+                rows, _ = load_capture()   # every row, memory-mapped from the binary copy
+                plt.figure(figsize=(10, 6))
+                scatter = plt.scatter(rows[:, 0], rows[:, 1], c=rows[:, 2], cmap='plasma', s=15)
+                plt.colorbar(scatter).set_label('Load_Sense_ADC')
+                plt.title('V-Feedback vs PWM (Multiple Loads)')
+                plt.xlabel('PWM Duty')
+                plt.ylabel('Feedback ADC')
+                plt.grid(True)
             plt.show()
         else:
             print("\nResult: No data was captured. Plotting skipped.")
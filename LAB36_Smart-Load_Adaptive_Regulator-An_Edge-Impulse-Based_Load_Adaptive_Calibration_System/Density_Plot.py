@@ -0,0 +1,74 @@
+import numpy as np
+import matplotlib.pyplot as plt
+
+# --- Configuration ---
+PWM_RANGE = (0, 256)        # x extent
+FEEDBACK_RANGE = (0, 4096)  # y extent (ESP32 12-bit ADC)
+PWM_BINS = 128
+FEEDBACK_BINS = 256
+# ---------------------
+
+
+class DensityGrid:
+    """2-D histogram of (PWM, Feedback) with the mean Load_Sense per bin.
+
+    Only two bin-sized accumulators are kept (count, load sum), so updating
+    and rendering cost depends on the bin count, not on the number of samples.
+    """
+
+    def __init__(self, x_range=PWM_RANGE, y_range=FEEDBACK_RANGE, x_bins=PWM_BINS, y_bins=FEEDBACK_BINS):
+        self.x_range = x_range
+        self.y_range = y_range
+        self.x_bins = x_bins
+        self.y_bins = y_bins
+        self.count = np.zeros(x_bins * y_bins, dtype=np.int64)
+        self.load_sum = np.zeros(x_bins * y_bins, dtype=np.float64)
+
+    def add(self, pwm, feedback, load_sense):
+        """Accumulate a batch of samples (arrays of equal length)."""
+        xi = ((np.asarray(pwm) - self.x_range[0]) * (self.x_bins / (self.x_range[1] - self.x_range[0]))).astype(np.int64)
+        yi = ((np.asarray(feedback) - self.y_range[0]) * (self.y_bins / (self.y_range[1] - self.y_range[0]))).astype(np.int64)
+        inside = (xi >= 0) & (xi < self.x_bins) & (yi >= 0) & (yi < self.y_bins)
+        key = yi[inside] * self.x_bins + xi[inside]
+        size = self.x_bins * self.y_bins
+        self.count += np.bincount(key, minlength=size)
+        self.load_sum += np.bincount(key, weights=np.asarray(load_sense, dtype=np.float64)[inside], minlength=size)
+
+    def add_store(self, store):
+        """Accumulate everything in a Capture_Engine.ColumnStore, chunk by chunk."""
+        for chunk in store.iter_chunks():
+            self.add(chunk[:, 0], chunk[:, 1], chunk[:, 2])
+
+    def mean_load(self):
+        """(y_bins, x_bins) image of mean Load_Sense, NaN where a bin is empty."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            image = self.load_sum / self.count
+        return image.reshape(self.y_bins, self.x_bins)
+
+    def extent(self):
+        return (*self.x_range, *self.y_range)
+
+
+class DensityPlot:
+    """Figure showing a DensityGrid; refresh() is cheap enough for live updates."""
+
+    def __init__(self, grid, title='V-Feedback vs PWM (Multiple Loads)'):
+        self.grid = grid
+        self.fig, self.ax = plt.subplots(figsize=(10, 6))
+        cmap = plt.get_cmap('plasma').copy()
+        cmap.set_bad(alpha=0)   # empty bins stay transparent
+        self.image = self.ax.imshow(grid.mean_load(), origin='lower', aspect='auto',
+                                    extent=grid.extent(), cmap=cmap, interpolation='nearest')
+        self.fig.colorbar(self.image, ax=self.ax).set_label('Load_Sense_ADC (mean per bin)')
+        self.ax.set_title(title)
+        self.ax.set_xlabel('PWM Duty')
+        self.ax.set_ylabel('Feedback ADC')
+        self.ax.grid(True)
+
+    def refresh(self):
+        image = self.grid.mean_load()
+        self.image.set_data(image)
+        if np.isfinite(image).any():
+            self.image.set_clim(np.nanmin(image), np.nanmax(image))
+        self.fig.canvas.draw_idle()
+        self.fig.canvas.flush_events()
@@ -0,0 +1,155 @@
+import os
+import sys
+import warnings
+import numpy as np
+
+# --- Configuration ---
+RAW_FILE = "training_data.f32"          # binary float32 rows written during capture
+INDEX_FILE = "training_data.index.csv"  # sweep start rows written during capture
+OUTPUT_FILE = "training_clean.csv"
+N_COLS = 3                              # PWM_Duty, Feedback_ADC, Load_Sense_ADC
+MIN_PWM = 60                            # dead zone cut (see Step 02, Data Cleaning)
+LOAD_BIN = 50                           # ADC counts per load-sense cluster
+OUTLIER_K = 3.5                         # robust z-score limit (MAD based)
+MIN_MAD = 5.0                           # ADC counts, floor for very tight clusters
+# ---------------------
+
+
+class SweepIndex:
+    """Records sweep boundaries while capturing (use as CaptureEngine.on_marker).
+
+    Each '# ... Starting New Sweep' line appends 'sweep,start_row' to the index
+    file and flushes it, so the index is valid even if the capture is killed.
+    """
+
+    def __init__(self, path=INDEX_FILE):
+        self.file = open(path, "w")
+        self.file.write("sweep,start_row\n")
+        self.count = 0
+
+    def __call__(self, line, row_index):
+        if "Starting New Sweep" in line:
+            self.file.write(f"{self.count},{row_index}\n")
+            self.file.flush()
+            self.count += 1
+
+    def close(self):
+        self.file.close()
+
+
+def load_capture(raw_path=RAW_FILE, index_path=INDEX_FILE, n_cols=N_COLS):
+    """Memory-map the raw capture and return (rows, sweep_starts)."""
+    if os.path.getsize(raw_path) < 4 * n_cols:   # np.memmap refuses an empty file
+        rows = np.empty((0, n_cols), dtype=np.float32)
+    else:
+        rows = np.memmap(raw_path, dtype=np.float32, mode='r')
+        rows = rows[:len(rows) // n_cols * n_cols].reshape(-1, n_cols)
+    starts = np.empty(0, dtype=np.int64)
+    if os.path.exists(index_path):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")   # header only: no sweep marker in this capture
+            index = np.loadtxt(index_path, delimiter=',', skiprows=1, dtype=np.int64, ndmin=2)
+        starts = index.reshape(-1, 2)[:, 1]
+    # rows before the first marker form a (partial) sweep of their own
+    starts = np.unique(np.concatenate([[0], starts[starts < len(rows)]]))
+    return rows, starts
+
+
+def sweep_curves(rows, starts, max_pwm=255):
+    """Per-sweep feedback/load curves, shaped (n_sweeps, n_levels), NaN where empty.
+
+    Rows are averaged per (sweep, PWM) with one bincount pass; nothing is sorted.
+    Only PWM values that actually occur get a column; they are returned as `levels`.
+    """
+    counts = np.diff(np.append(starts, len(rows)))
+    sweep_id = np.repeat(np.arange(len(starts)), counts)
+    pwm = np.clip(np.rint(rows[:, 0]), 0, max_pwm).astype(np.int64)
+    levels = np.flatnonzero(np.bincount(pwm, minlength=max_pwm + 1))
+    lookup = np.zeros(max_pwm + 1, dtype=np.int64)
+    lookup[levels] = np.arange(len(levels))
+    n_levels = len(levels)
+    key = sweep_id * n_levels + lookup[pwm]
+    size = len(starts) * n_levels
+
+    n = np.bincount(key, minlength=size).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        feedback = np.bincount(key, weights=rows[:, 1], minlength=size) / n
+        load = np.bincount(key, weights=rows[:, 2], minlength=size) / n
+    shape = (len(starts), n_levels)
+    return levels, feedback.reshape(shape), load.reshape(shape), n.reshape(shape)
+
+
+def reject_outliers(feedback, load, load_bin=LOAD_BIN, k=OUTLIER_K, min_mad=MIN_MAD):
+    """Group sweeps by load-sense cluster; flag points far from the cluster median.
+
+    Returns (cluster per sweep, inlier mask shaped like feedback).
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)   # all-NaN rows/columns
+        sweep_load = np.nanmedian(load, axis=1)
+        cluster = np.rint(np.nan_to_num(sweep_load) / load_bin).astype(np.int64)
+        inlier = ~np.isnan(feedback)
+        for c in np.unique(cluster):
+            members = np.flatnonzero(cluster == c)
+            if len(members) < 3:
+                continue  # too few sweeps to tell what an outlier is
+            block = feedback[members]
+            med = np.nanmedian(block, axis=0)
+            dev = np.abs(block - med)
+            mad = np.maximum(1.4826 * np.nanmedian(dev, axis=0), min_mad)
+            inlier[members] &= dev <= k * mad
+    return cluster, inlier
+
+
+def cluster_means(levels, feedback, load, cluster, inlier):
+    """Average the inlier sweeps of each (load cluster, PWM) cell.
+
+    Returns rows [PWM, Feedback, Load, n_sweeps].
+    """
+    clusters, cluster_idx = np.unique(cluster, return_inverse=True)
+    key = (cluster_idx[:, None] * len(levels) + np.arange(len(levels))).ravel()
+    mask = inlier.ravel()
+    size = len(clusters) * len(levels)
+    n = np.bincount(key[mask], minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fb = np.bincount(key[mask], weights=feedback.ravel()[mask], minlength=size) / n
+        ld = np.bincount(key[mask], weights=load.ravel()[mask], minlength=size) / n
+    keep = n > 0
+    pwm = np.tile(levels, len(clusters))
+    return np.column_stack([pwm[keep], fb[keep], ld[keep], n[keep]]).astype(np.float32)
+
+
+def build_dataset(raw_path=RAW_FILE, index_path=INDEX_FILE, min_pwm=MIN_PWM):
+    """Return (training rows [PWM, Feedback, Load, n_sweeps], summary dict)."""
+    rows, starts = load_capture(raw_path, index_path)
+    levels, feedback, load, n = sweep_curves(rows, starts)
+    cluster, inlier = reject_outliers(feedback, load)
+
+    present = n > 0
+    inlier[:, levels < min_pwm] = False
+    present[:, levels < min_pwm] = False
+    training = cluster_means(levels, feedback, load, cluster, inlier)
+
+    summary = {
+        "raw_rows": len(rows),
+        "sweeps": len(starts),
+        "clusters": len(np.unique(cluster)),
+        "rejected": int(np.sum(present & ~inlier)),
+        "training_rows": len(training),
+    }
+    return training, summary
+
+
+def main():
+    raw_path = sys.argv[1] if len(sys.argv) > 1 else RAW_FILE
+    index_path = sys.argv[2] if len(sys.argv) > 2 else INDEX_FILE
+    training, summary = build_dataset(raw_path, index_path)
+    np.savetxt(OUTPUT_FILE, training[:, :3], delimiter=',', fmt=['%d', '%.2f', '%.2f'],
+               header="PWM_Duty,Feedback_ADC,Load_Sense_ADC", comments='')
+    print(f"Raw rows: {summary['raw_rows']} | Sweeps: {summary['sweeps']} | "
+          f"Load clusters: {summary['clusters']} | Outliers rejected: {summary['rejected']}")
+    print(f"Wrote {summary['training_rows']} rows to {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
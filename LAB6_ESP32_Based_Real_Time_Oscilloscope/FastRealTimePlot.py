@@ -0,0 +1,221 @@
+import struct
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+import serial
+
+# ===== User settings =====
+PORT = 'COM5'
+BAUD = 115200
+HISTORY = 20000        # samples kept on screen (before decimation)
+SCREEN_POINTS = 800    # ~ horizontal pixels of the plot area
+PROTOCOL = 'ascii'     # 'ascii' (original b's' handshake) or 'binary' (block transfer)
+BULK_REQUESTS = 64     # handshakes sent per read (ascii mode)
+BLOCK_SIZE = 512       # samples per block request (binary mode)
+DISPLAY_FPS = 30       # redraw rate, independent of sample rate
+Y_LIMITS = (1000, 5500)
+
+
+class BlitScope:
+    """Oscilloscope view: axes are drawn once, only the trace is blitted."""
+
+    def __init__(self, history=HISTORY, screen_points=SCREEN_POINTS, ylim=Y_LIMITS):
+        self.history = history
+        self.screen_points = screen_points
+        self.buffer = np.full(history, np.nan, dtype=np.float32)
+        self.count = 0
+
+        self.fig, self.ax = plt.subplots()
+        self.ax.set_xlim(0, screen_points - 1)
+        self.ax.set_ylim(*ylim)
+        self.ax.set_title('Osciloscope')
+        self.ax.set_ylabel('data')
+        self.ax.grid(True)
+        self.x = np.arange(screen_points)
+        self.line, = self.ax.plot(self.x, np.full(screen_points, np.nan),
+                                  'r-', label='Channel 0', animated=True)
+        self.ax.legend(loc='lower right')
+
+        self.background = None
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+        plt.show(block=False)
+        plt.pause(0.1)
+
+    def _on_draw(self, event):
+        # Static artists (axes, grid, legend) are cached after every full draw,
+        # e.g. after the window is resized
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.ax.draw_artist(self.line)
+
+    def push(self, samples):
+        """Append new samples to the rolling history (oldest are dropped)."""
+        samples = np.asarray(samples, dtype=np.float32)
+        n = len(samples)
+        if n == 0:
+            return
+        if n >= self.history:
+            self.buffer[:] = samples[-self.history:]
+        else:
+            self.buffer[:-n] = self.buffer[n:]
+            self.buffer[-n:] = samples
+        self.count += n
+
+    def decimate(self):
+        """Reduce the history to one value per screen point (block mean)."""
+        factor = self.history // self.screen_points
+        if factor <= 1:
+            return self.buffer[-self.screen_points:]
+        usable = self.buffer[-factor * self.screen_points:]
+        return usable.reshape(self.screen_points, factor).mean(axis=1)
+
+    def draw(self):
+        if self.background is None:
+            return
+        self.line.set_ydata(self.decimate())
+        self.fig.canvas.restore_region(self.background)
+        self.ax.draw_artist(self.line)
+        self.fig.canvas.blit(self.fig.bbox)
+        self.fig.canvas.flush_events()
+
+
+class AsciiReader:
+    """Original text protocol: one b's' handshake -> one printed sample line.
+
+    Handshakes are sent in bulk so many replies can be in flight at once.
+    """
+
+    def __init__(self, port, requests=BULK_REQUESTS):
+        self.port = port
+        self.requests = requests
+        self.pending = b''
+        self.outstanding = 0
+
+    def read(self):
+        # top up the handshakes in flight without flooding the ESP32 RX buffer
+        if self.outstanding < self.requests // 2:
+            self.port.write(b's' * self.requests)
+            self.outstanding += self.requests
+        self.pending += self.port.read(max(self.port.in_waiting, 1))
+        lines = self.pending.split(b'\n')
+        self.pending = lines.pop()  # keep the partial last line
+        self.outstanding = max(0, self.outstanding - len(lines))
+        if not lines and self.port.in_waiting == 0:
+            self.outstanding = 0  # replies were lost, allow a new burst
+        values = b' '.join(lines).split()
+        try:
+            return np.array(values, dtype=np.float32)
+        except ValueError:
+            # drop garbage lines (e.g. boot messages) without losing the batch
+            return np.array([v for v in values if _is_number(v)], dtype=np.float32)
+
+
+def _is_number(token):
+    try:
+        float(token)
+        return True
+    except ValueError:
+        return False
+
+
+class BlockReader:
+    """Block transfer protocol: b'b' + uint16 N -> one packed binary frame.
+
+    Frame layout (little endian):
+        0xAA 0x55 | uint16 N | N x uint16 samples | uint16 checksum
+    The checksum is the sum of the N samples modulo 65536.
+    """
+
+    SYNC = b'\xAA\x55'
+    HEADER = struct.Struct('<2sH')
+    CHECKSUM = struct.Struct('<H')
+    MAX_IN_FLIGHT = 2   # request the next block while the current one arrives
+    REPLY_TIMEOUT = 0.5  # seconds without a frame before re-requesting
+
+    def __init__(self, port, block_size=BLOCK_SIZE):
+        self.port = port
+        self.block_size = block_size
+        self.pending = b''
+        self.outstanding = 0
+        self.last_frame = time.monotonic()
+        self.checksum_errors = 0
+        self.sync_errors = 0
+
+    def read(self):
+        now = time.monotonic()
+        if now - self.last_frame > self.REPLY_TIMEOUT:
+            self.outstanding = 0
+            self.last_frame = now
+        while self.outstanding < self.MAX_IN_FLIGHT:
+            self.port.write(b'b' + struct.pack('<H', self.block_size))
+            self.outstanding += 1
+
+        self.pending += self.port.read(max(self.port.in_waiting, 1))
+        blocks = []
+        while True:
+            start = self.pending.find(self.SYNC)
+            if start < 0:
+                self.pending = self.pending[-1:]  # may be the first sync byte
+                break
+            self.pending = self.pending[start:]
+            if len(self.pending) < self.HEADER.size:
+                break
+            _, n = self.HEADER.unpack_from(self.pending)
+            if n == 0 or n > self.block_size:
+                # false sync inside sample data: don't wait for a frame that never ends
+                self.sync_errors += 1
+                self.pending = self.pending[len(self.SYNC):]
+                continue
+            frame_len = self.HEADER.size + 2 * n + self.CHECKSUM.size
+            if len(self.pending) < frame_len:
+                break
+
+            samples = np.frombuffer(self.pending, dtype='<u2', count=n,
+                                    offset=self.HEADER.size)
+            (checksum,) = self.CHECKSUM.unpack_from(self.pending, frame_len - self.CHECKSUM.size)
+            if int(samples.sum(dtype=np.uint32)) & 0xFFFF != checksum:
+                # corrupted or false sync: skip it and look for the next frame
+                self.checksum_errors += 1
+                self.pending = self.pending[len(self.SYNC):]
+                continue
+
+            blocks.append(samples.astype(np.float32))
+            self.pending = self.pending[frame_len:]
+            self.outstanding = max(0, self.outstanding - 1)
+            self.last_frame = now
+
+        if not blocks:
+            return np.empty(0, dtype=np.float32)
+        return np.concatenate(blocks)
+
+
+def main():
+    port = serial.Serial(PORT, BAUD, timeout=0.01)
+    scope = BlitScope()
+    if PROTOCOL == 'binary':
+        reader = BlockReader(port)
+    else:
+        reader = AsciiReader(port)
+    frame_period = 1.0 / DISPLAY_FPS
+    next_frame = time.monotonic()
+    last_count, last_report = 0, time.monotonic()
+
+    try:
+        while plt.fignum_exists(scope.fig.number):
+            scope.push(reader.read())
+
+            now = time.monotonic()
+            if now >= next_frame:
+                scope.draw()
+                next_frame = now + frame_period
+            if now - last_report >= 1.0:
+                rate = (scope.count - last_count) / (now - last_report)
+                print(f"Channel 0: {rate:7.0f} samples/s", end='\r')
+                last_count, last_report = scope.count, now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        port.close()
+
+
+if __name__ == '__main__':
+    main()
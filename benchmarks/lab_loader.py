@@ -0,0 +1,83 @@
+"""
+Load analysis functions out of the lab scripts without running them.
+
+The lab scripts open serial ports, build figures or draw Streamlit widgets at
+import time, so they cannot simply be imported. Instead the script is parsed
+and only the pieces a function needs are executed: imports of numeric
+libraries, constant assignments (no calls) and the function definitions,
+with decorators such as @st.cache_data stripped. The script's own folder is
+on sys.path meanwhile, so imports of sibling modules (LAB34 Trial_Store) work.
+"""
+
+import ast
+import os
+import re
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SKIP_MODULES = ("serial", "streamlit", "matplotlib", "networkx", "lab_tools")
+
+
+def _has_call(node):
+    return any(isinstance(n, ast.Call) for n in ast.walk(node))
+
+
+def _keep_import(node):
+    names = [a.name for a in node.names] if isinstance(node, ast.Import) else [node.module or ""]
+    return not any(n.split(".")[0] in SKIP_MODULES for n in names)
+
+
+def _run(node, path, namespace):
+    exec(compile(ast.Module(body=[node], type_ignores=[]), path, "exec"), namespace)
+
+
+def load_functions(relative_path, names):
+    """Return {name: function} for the top-level functions `names` in a lab script."""
+    path = os.path.join(REPO_ROOT, relative_path)
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    namespace = {"__name__": "lab_" + os.path.basename(os.path.dirname(path))}
+    sys.path.insert(0, os.path.dirname(path))
+    try:
+        for node in tree.body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)) and _keep_import(node):
+                _run(node, path, namespace)
+            elif isinstance(node, ast.Assign) and not _has_call(node.value):
+                try:
+                    _run(node, path, namespace)
+                except NameError:
+                    pass   # refers to a figure, widget or port that was not created
+            elif isinstance(node, ast.FunctionDef):
+                node.decorator_list = []
+                _run(node, path, namespace)
+    finally:
+        sys.path.remove(os.path.dirname(path))
+
+    missing = [n for n in names if n not in namespace]
+    if missing:
+        raise LookupError(f"{relative_path}: no top-level function {', '.join(missing)}")
+    return {n: namespace[n] for n in names}
+
+
+def _defines(path, function):
+    with open(path, encoding="utf-8") as f:
+        return re.search(rf"^def {re.escape(function)}\(", f.read(), re.MULTILINE) is not None
+
+
+def find_script(lab_prefix, function=None, pattern=".py"):
+    """Path (relative to the repository root) of the .py script in the LABnn_ folder.
+
+    With `function`, the script that defines it at top level (a lab folder
+    can hold helper modules next to its main script).
+    """
+    for entry in sorted(os.listdir(REPO_ROOT)):
+        folder = os.path.join(REPO_ROOT, entry)
+        if entry.startswith(lab_prefix + "_") and os.path.isdir(folder):
+            scripts = [f for f in sorted(os.listdir(folder)) if f.endswith(pattern)]
+            if function is not None:
+                scripts = [f for f in scripts if _defines(os.path.join(folder, f), function)]
+            if scripts:
+                return os.path.join(entry, scripts[0])
+    raise FileNotFoundError(f"no script matching {pattern}{' defining ' + function if function else ''} "
+                            f"in {lab_prefix}_*")
@@ -0,0 +1,234 @@
+"""
+Benchmarks for the analysis hot paths of the lab scripts.
+
+Every case times one lab function on seeded synthetic input at several
+sizes. Results are appended to results/history.jsonl together with the git
+commit and library versions, and compared against the previous run (or a
+chosen baseline) so regressions show up before code reaches the lab PCs.
+
+    python benchmarks/run_benchmarks.py                 # run all, compare to last run
+    python benchmarks/run_benchmarks.py -k LAB31 --quick
+    python benchmarks/run_benchmarks.py --baseline 3 --fail-on-regression
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import timeit
+
+import numpy as np
+import scipy
+
+from lab_loader import REPO_ROOT, find_script, load_functions
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(HERE, "results", "history.jsonl")
+REPEAT = 5
+MIN_TIME = 0.2             # s of calls per repeat, the number of calls is scaled to it
+REGRESSION_RATIO = 1.25    # slower than baseline by this factor -> flagged
+SEED = 1234
+
+
+# --- synthetic inputs ---
+def step_with_ringing(n, rng, fs=170000, f_ring=20000.0, vref=3.3):
+    """Smoothed ADC trace: low level, rising edge at n/4, damped ringing, noise."""
+    t = (np.arange(n) - n // 4) / fs
+    v = np.where(t < 0, 0.2, 2.8 + 0.4 * np.exp(-t * 8000) * np.cos(2 * np.pi * f_ring * t))
+    return np.clip(v + rng.normal(0, 0.01, n), 0, vref)
+
+
+def rlc_response(n, rng, fs=170000, f0=5033.0):
+    t = np.arange(n) / fs
+    return 1.65 + 1.2 * np.exp(-t * 200) * np.sin(2 * np.pi * f0 * t) + rng.normal(0, 0.02, n)
+
+
+def readout_chunk(n, rng, fs=170000, f0=5000.0):
+    t = np.arange(n) / fs
+    return (1.65 + 0.5 * np.sin(2 * np.pi * f0 * t + 0.3) + rng.normal(0, 0.05, n)).astype(np.float32)
+
+
+# --- cases: name -> (script, function, sizes, setup(fn, size, rng) -> zero-arg callable) ---
+def _lab31_detect(fn, n, rng):
+    volt = step_with_ringing(n, rng)
+    return lambda: fn(volt)
+
+
+def _lab31_analyze(fn, n, rng):
+    window = step_with_ringing(n, rng)
+    return lambda: fn(window)
+
+
+def _lab32_analyze(fn, n, rng):
+    volt = rlc_response(n, rng)
+    return lambda: fn(volt)
+
+
+def _lab34_iq(fn, n, rng):
+    chunk = readout_chunk(n, rng)
+    return lambda: fn(chunk)
+
+
+def _lab28_trigger(fn, trials, rng):
+    def run():
+        np.random.seed(SEED)   # the function draws from the global generator
+        return [fn(135, noise, trials=trials) for noise in range(0, 256, 16)]
+    return run
+
+
+def _lab28_exact(fn, points, rng):
+    noise = np.linspace(0, 255, points)
+    return lambda: fn(135, noise, model="gaussian", modulation=0.5)
+
+
+def _lab28_sr(fn, samples, rng):
+    levels = np.arange(0, 256, 16)
+    return lambda: fn(135, 20, levels, 64, samples, seed=SEED, workers=1)
+
+
+def _lab29_resonator(fn, calls, rng):
+    qubit = rng.uniform(7000, 10000, calls)
+    coupling = rng.uniform(0, 1, calls)
+
+    def run():
+        np.random.seed(SEED)
+        return [fn(q, c, mode="B") for q, c in zip(qubit, coupling)]
+    return run
+
+
+def _lab26_dynamics(fn, steps, rng):
+    return lambda: fn(10000, 10000, 4.7e-6, t_max=10, dt=10 / steps)
+
+
+def _lab27_dynamics(fn, n, rng):
+    angles = np.linspace(0, 45, n)
+    return lambda: fn(angles, 1100, 100, 0.3)
+
+
+CASES = {
+    "LAB31.detect_rising_edge_window": ("LAB31", "detect_rising_edge_window", [1024, 4096, 16384], _lab31_detect),
+    "LAB31.analyze_overshoot_ringing": ("LAB31", "analyze_overshoot_ringing", [400, 1024, 4096], _lab31_analyze),
+    "LAB32.analyze_qubit": ("LAB32", "analyze_qubit", [1024, 2048, 8192], _lab32_analyze),
+    "LAB34.iq_demod": ("LAB34", "iq_demod", [512, 1024, 4096], _lab34_iq),
+    "LAB28.ne555_trigger_simulation": ("LAB28", "ne555_trigger_simulation", [50, 200, 500], _lab28_trigger),
+    "LAB28.detection_probability": ("LAB28", "detection_probability", [64, 1024, 16384], _lab28_exact),
+    "LAB28.sr_sweep": ("LAB28", "sr_sweep", [1 << 16, 1 << 18, 1 << 20], _lab28_sr),
+    "LAB29.ne555_resonator_freq": ("LAB29", "ne555_resonator_freq", [100, 1000, 10000], _lab29_resonator),
+    "LAB26.system_dynamics": ("LAB26", "system_dynamics", [1000, 10000, 100000], _lab26_dynamics),
+    "LAB27.system_dynamics": ("LAB27", "system_dynamics", [100, 10000, 1000000], _lab27_dynamics),
+}
+
+
+def time_callable(run, repeat=REPEAT, min_time=MIN_TIME):
+    """(best, median) seconds per call; calls per repeat scaled so a repeat lasts ~min_time."""
+    run()   # warm-up (imports, FFT plans, caches)
+    number, elapsed = 1, 0.0
+    while True:
+        elapsed = timeit.timeit(run, number=number)
+        if elapsed >= min_time / 5 or number >= 1 << 20:
+            break
+        number *= 10
+    number = max(1, int(number * (min_time / max(elapsed, 1e-9))))
+    times = np.array(timeit.repeat(run, number=number, repeat=repeat)) / number
+    return float(times.min()), float(np.median(times))
+
+
+def run_cases(pattern=None, quick=False):
+    results = []
+    for name, (lab, func, sizes, setup) in CASES.items():
+        if pattern and pattern not in name:
+            continue
+        fn = load_functions(find_script(lab, func), [func])[func]
+        for size in (sizes[:1] if quick else sizes):
+            run = setup(fn, size, np.random.default_rng(SEED))
+            best, median = time_callable(run, repeat=3 if quick else REPEAT,
+                                         min_time=MIN_TIME / 4 if quick else MIN_TIME)
+            results.append({"case": name, "size": size, "best_s": best, "median_s": median})
+            print(f"  {name:<34} n={size:<8} best {best * 1e3:10.4f} ms  median {median * 1e3:10.4f} ms")
+    return results
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                             capture_output=True, text=True, timeout=10)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                               capture_output=True, text=True, timeout=30).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "")
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def load_history(path=HISTORY_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_run(run, path=HISTORY_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(run) + "\n")
+
+
+def compare(results, baseline, ratio=REGRESSION_RATIO):
+    """Print best-time ratios against `baseline`; returns the regressed (case, size) pairs."""
+    previous = {(r["case"], r["size"]): r["best_s"] for r in baseline["results"]}
+    regressions = []
+    print(f"\nCompared with run {baseline['run']} ({baseline['commit']}, {baseline['timestamp']}):")
+    for r in results:
+        key = (r["case"], r["size"])
+        if key not in previous:
+            continue
+        change = r["best_s"] / previous[key]
+        flag = ""
+        if change > ratio:
+            flag = "  <-- REGRESSION"
+            regressions.append(key)
+        elif change < 1 / ratio:
+            flag = "  (faster)"
+        print(f"  {r['case']:<34} n={r['size']:<8} x{change:6.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the lab analysis functions")
+    parser.add_argument("-k", dest="pattern", help="only cases whose name contains this text")
+    parser.add_argument("--quick", action="store_true", help="smallest size only, fewer repeats")
+    parser.add_argument("--baseline", type=int, help="history run number to compare against (default: last)")
+    parser.add_argument("--no-save", action="store_true", help="do not append this run to the history")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on regressions")
+    args = parser.parse_args()
+
+    history = load_history()
+    run = {
+        "run": len(history),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "machine": f"{platform.node()} {platform.machine()}",
+        "quick": args.quick,
+    }
+    print(f"Run {run['run']} @ {run['commit']} (numpy {run['numpy']}, scipy {run['scipy']})")
+    run["results"] = run_cases(args.pattern, args.quick)
+
+    regressions = []
+    candidates = [h for h in history if h["machine"] == run["machine"]]
+    if args.baseline is not None:
+        candidates = [h for h in history if h["run"] == args.baseline]
+    if candidates:
+        regressions = compare(run["results"], candidates[-1])
+    if not args.no_save:
+        save_run(run)
+        print(f"\nSaved to {os.path.relpath(HISTORY_FILE, REPO_ROOT)}")
+    if regressions and args.fail_on_regression:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""Helpers shared by the lab host scripts (add the repository root to sys.path to import)."""
+
+from .adc import AdcConverter, load_calibration, two_point_calibration
+from .decimate import MinMaxPyramid, minmax_decimate
+from .filters import StreamFilter
+from .jobs import SweepJob, follow, start_sweep
+from .multichannel import ChannelRing, MultiChannelAcquisition, deinterleave, parse_lab25_line
+from .pipeline import STOP, MeteredQueue, Stage
+from .profiling import FrameProfiler, profiling_enabled
+from .timing import StatsPanel, StreamStats, tone_sample_rate
+from .trigger import Capture, TriggerEngine
+
+__all__ = [
+    "AdcConverter", "load_calibration", "two_point_calibration",
+    "MinMaxPyramid", "minmax_decimate",
+    "StreamFilter",
+    "SweepJob", "follow", "start_sweep",
+    "ChannelRing", "MultiChannelAcquisition", "deinterleave", "parse_lab25_line",
+    "STOP", "MeteredQueue", "Stage",
+    "FrameProfiler", "profiling_enabled",
+    "StatsPanel", "StreamStats", "tone_sample_rate",
+    "Capture", "TriggerEngine",
+]
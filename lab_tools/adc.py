@@ -0,0 +1,93 @@
+"""
+ADC code -> voltage conversion shared by the STM32 capture scripts.
+
+All conversions go through a precomputed lookup table (one float32 per ADC
+code, per-board gain/offset already applied) and write into caller-owned
+float32 buffers, so the per-frame cost is one table lookup and no
+temporaries.
+"""
+
+import json
+import os
+import numpy as np
+
+# --- Defaults (STM32F103 12-bit ADC, 3.3 V reference) ---
+VREF = 3.3
+ADC_BITS = 12
+CALIBRATION_FILE = os.path.join(os.path.dirname(__file__), "adc_calibration.json")
+# ---------------------------------------------------------
+
+
+def two_point_calibration(code_a, volts_a, code_b, volts_b, vref=VREF, bits=ADC_BITS):
+    """(gain, offset) that maps the nominal code*vref/full_scale onto two measured points."""
+    full_scale = (1 << bits) - 1
+    nominal_a = code_a * vref / full_scale
+    nominal_b = code_b * vref / full_scale
+    gain = (volts_b - volts_a) / (nominal_b - nominal_a)
+    return gain, volts_a - gain * nominal_a
+
+
+def load_calibration(board, path=CALIBRATION_FILE):
+    """(gain, offset) for `board` from the calibration JSON, identity if it is not listed."""
+    if board is None or not os.path.exists(path):
+        return 1.0, 0.0
+    with open(path) as f:
+        entry = json.load(f).get(board, {})
+    return float(entry.get("gain", 1.0)), float(entry.get("offset", 0.0))
+
+
+class AdcConverter:
+    """Raw UART/DMA bytes -> float32 volts via a lookup table.
+
+    byte_order: '<' (little endian, STM32 native) or '>' (swapped on the wire)
+    reverse:    flip sample order (DMA buffer sent back to front)
+    mask:       bits to keep, e.g. 0x0FFF when the upper nibble carries junk
+    gain/offset or board: calibration applied to the nominal code*vref/4095
+    """
+
+    def __init__(self, vref=VREF, bits=ADC_BITS, gain=None, offset=None, board=None,
+                 byte_order='<', reverse=False, mask=None):
+        cal_gain, cal_offset = load_calibration(board)
+        self.gain = cal_gain if gain is None else gain
+        self.offset = cal_offset if offset is None else offset
+        self.vref = vref
+        self.bits = bits
+        self.dtype = np.dtype(byte_order + 'u2')
+        self.reverse = reverse
+        self.mask = mask
+        self.lut = self._build_lut()
+        self._codes = np.empty(0, dtype=np.uint16)
+
+    def _build_lut(self):
+        size = 1 << self.bits
+        nominal = np.arange(size, dtype=np.float64) * (self.vref / (size - 1))
+        return (nominal * self.gain + self.offset).astype(np.float32)
+
+    def set_calibration(self, gain, offset):
+        self.gain, self.offset = gain, offset
+        self.lut = self._build_lut()
+
+    def codes(self, raw):
+        """ADC codes for a bytes-like frame; a view, or an internal buffer when masking."""
+        codes = np.frombuffer(raw, dtype=self.dtype)
+        if self.reverse:
+            codes = codes[::-1]
+        if self.mask is not None:
+            if len(self._codes) != len(codes):
+                self._codes = np.empty(len(codes), dtype=np.uint16)
+            codes = np.bitwise_and(codes, self.mask, out=self._codes)
+        return codes
+
+    def to_volts(self, codes, out=None):
+        """Look up `codes` into `out` (float32, allocated if None)."""
+        if out is None:
+            out = np.empty(len(codes), dtype=np.float32)
+        # codes above full scale (unmasked junk bits) clip to the top entry
+        return np.take(self.lut, codes, out=out, mode='clip')
+
+    def convert(self, raw, out=None):
+        return self.to_volts(self.codes(raw), out)
+
+    def buffer(self, n_samples):
+        """Preallocated output buffer for `convert`."""
+        return np.empty(n_samples, dtype=np.float32)
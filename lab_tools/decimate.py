@@ -0,0 +1,153 @@
+"""
+Min/max ("peak detect") decimation for long scope traces.
+
+A line through the per-pixel minimum and maximum looks the same as the full
+trace at screen resolution, but it is only ~2 points per pixel, and a
+one-sample glitch or overshoot spike still shows up. MinMaxPyramid keeps
+the min/max of blocks of factor**k samples for every level k while data
+streams in. A view of any range at any zoom then reads the coarsest level
+that still resolves a pixel, so the cost depends on the number of pixels,
+not on the number of samples.
+"""
+
+import numpy as np
+
+
+def _bin_reduce(pos, lo, hi, start, stop, pixels):
+    """Reduce elements at positions `pos` (sorted) into `pixels` bins over [start, stop)."""
+    edges = start + (stop - start) * np.arange(pixels + 1) / pixels
+    first = np.searchsorted(pos, edges[:-1], side='left')
+    last = np.searchsorted(pos, edges[1:], side='left')
+    used = first < last
+    first = first[used]
+    if len(first) == 0:
+        return np.empty(0), np.empty(0, dtype=lo.dtype)
+    mins = np.minimum.reduceat(lo, first)
+    maxs = np.maximum.reduceat(hi, first)
+    # reduceat runs each bin to the next start; trim the last bin to its own end
+    end = last[used][-1]
+    mins[-1] = lo[first[-1]:end].min()
+    maxs[-1] = hi[first[-1]:end].max()
+    centers = 0.5 * (edges[:-1] + edges[1:])[used]
+    return np.repeat(centers, 2), np.column_stack([mins, maxs]).ravel()
+
+
+def minmax_decimate(y, pixels, x0=0):
+    """(x, y) with a min and a max per pixel for a 1-D array; small inputs pass through."""
+    y = np.asarray(y)
+    if len(y) <= 2 * pixels:
+        return np.arange(x0, x0 + len(y)), y
+    pos = np.arange(len(y)) + x0
+    return _bin_reduce(pos, y, y, x0, x0 + len(y), pixels)
+
+
+class MinMaxPyramid:
+    """Streaming multi-resolution min/max store.
+
+    Holds the last `capacity` samples (older ones are dropped in large
+    aligned steps, so appends are amortized O(chunk)). Level k stores the min
+    and max of each complete block of factor**k samples. Positions in
+    append/view are absolute sample indices; `first` is the oldest one kept.
+    """
+
+    def __init__(self, capacity=1 << 21, factor=8, levels=5, dtype=np.float32):
+        top = factor ** levels
+        if capacity % (2 * top):
+            raise ValueError(f"capacity must be a multiple of {2 * top}")
+        self.capacity = capacity
+        self.factor = factor
+        self.raw = np.empty(capacity, dtype=dtype)
+        self.lo = [None] + [np.empty(capacity // factor ** k, dtype=dtype) for k in range(1, levels + 1)]
+        self.hi = [None] + [np.empty(capacity // factor ** k, dtype=dtype) for k in range(1, levels + 1)]
+        self.built = [0] * (levels + 1)   # complete blocks per level (level 0: samples)
+        self.first = 0                     # absolute index of raw[0]
+        self._drop = capacity // 2
+
+    @property
+    def length(self):
+        return self.built[0]
+
+    @property
+    def end(self):
+        """Absolute index one past the newest sample."""
+        return self.first + self.built[0]
+
+    def append(self, samples):
+        samples = np.asarray(samples)
+        if len(samples) > self.capacity // 2:
+            self.first += len(samples) - self.capacity // 2 + self.length
+            for k in range(len(self.built)):
+                self.built[k] = 0
+            samples = samples[-(self.capacity // 2):]
+        if self.length + len(samples) > self.capacity:
+            self._discard_oldest()
+        n = self.length
+        self.raw[n:n + len(samples)] = samples
+        self.built[0] = n + len(samples)
+        self._build_levels()
+
+    def _discard_oldest(self):
+        drop = self._drop
+        for k in range(len(self.built)):
+            d = drop // self.factor ** k
+            keep = self.built[k] - d
+            if k == 0:
+                self.raw[:keep] = self.raw[d:self.built[0]]
+            else:
+                self.lo[k][:keep] = self.lo[k][d:self.built[k]]
+                self.hi[k][:keep] = self.hi[k][d:self.built[k]]
+            self.built[k] = keep
+        self.first += drop
+
+    def _build_levels(self):
+        f = self.factor
+        for k in range(1, len(self.built)):
+            if k == 1:
+                src_lo = src_hi = self.raw
+            else:
+                src_lo, src_hi = self.lo[k - 1], self.hi[k - 1]
+            done, ready = self.built[k], self.built[k - 1] // f
+            if ready > done:
+                lo_blocks = src_lo[done * f:ready * f].reshape(-1, f)
+                hi_blocks = src_hi[done * f:ready * f].reshape(-1, f)
+                self.lo[k][done:ready] = lo_blocks.min(axis=1)
+                self.hi[k][done:ready] = hi_blocks.max(axis=1)
+                self.built[k] = ready
+
+    def tail(self, n):
+        """The newest n raw samples (a view)."""
+        return self.raw[max(self.length - n, 0):self.length]
+
+    def view(self, start, stop, pixels):
+        """(x, y) envelope of absolute range [start, stop) for a `pixels` wide plot.
+
+        Level blocks are binned by their centre, so a bin edge is resolved to
+        within one block (at most half a pixel); no extreme is ever lost.
+        """
+        start = max(start, self.first)
+        stop = min(stop, self.end)
+        if stop <= start:
+            return np.empty(0), np.empty(0, dtype=self.raw.dtype)
+        a, b = start - self.first, stop - self.first
+        per_pixel = (stop - start) / pixels
+        if per_pixel <= 2:
+            return np.arange(start, stop), self.raw[a:b]
+
+        # coarsest level that still gives >= 2 elements per pixel
+        k = 0
+        while k + 1 < len(self.built) and self.factor ** (k + 1) * 2 <= per_pixel:
+            k += 1
+        if k == 0:
+            return _bin_reduce(np.arange(start, stop), self.raw[a:b], self.raw[a:b], start, stop, pixels)
+
+        block = self.factor ** k
+        b0 = a // block
+        b1 = min(-(-b // block), self.built[k])
+        pos = self.first + (np.arange(b0, b1) + 0.5) * block
+        lo, hi = self.lo[k][b0:b1], self.hi[k][b0:b1]
+        tail = max(b1 * block, a)
+        if tail < b:   # samples not yet folded into a complete block at this level
+            pos = np.concatenate([pos, self.first + np.arange(tail, b)])
+            lo = np.concatenate([lo, self.raw[tail:b]])
+            hi = np.concatenate([hi, self.raw[tail:b]])
+        return _bin_reduce(pos, lo, hi, start, stop, pixels)
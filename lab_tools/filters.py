@@ -0,0 +1,114 @@
+"""
+Streaming smoothing filters that carry their state from chunk to chunk.
+
+Filtering a signal in chunks with StreamFilter gives exactly the same output
+as filtering it in one piece: the FIR/IIR state (scipy `zi`) or the last
+size-1 input samples are kept between calls. The state is primed with the
+first sample, so there is no start-up ramp from zero. Coefficients are
+designed once per configuration and cached. The moving average works in
+preallocated buffers (no allocation per chunk).
+
+All filters are causal, so the output lags the input by `delay` samples
+(uniform_filter1d is centred and does not).
+"""
+
+import functools
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import signal
+from scipy.ndimage import uniform_filter1d
+
+KINDS = ("moving_average", "fir", "iir", "median")
+
+
+@functools.lru_cache(maxsize=32)
+def design(kind, size=8, cutoff=None, fs=None, order=4, btype="lowpass"):
+    """Coefficients for a filter configuration: b for FIR kinds, sos for IIR, None otherwise."""
+    if kind == "moving_average":
+        return np.full(size, 1.0 / size)
+    if kind == "fir":
+        return signal.firwin(size, cutoff, fs=fs, pass_zero=btype)
+    if kind == "iir":
+        return signal.butter(order, cutoff, btype=btype, fs=fs, output="sos")
+    return None
+
+
+class StreamFilter:
+    """One filter stage; call process() per chunk, reset() at a gap in the stream.
+
+    kind            parameters
+    moving_average  size
+    fir             size (taps), cutoff [Hz or (lo, hi)], fs, btype; or taps=array
+    iir             order, cutoff, fs, btype (Butterworth, second-order sections)
+    median          size (odd)
+    """
+
+    def __init__(self, kind="moving_average", size=8, cutoff=None, fs=None, order=4,
+                 btype="lowpass", taps=None, dtype=np.float32):
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {KINDS}")
+        if isinstance(cutoff, list):
+            cutoff = tuple(cutoff)
+        self.kind = kind
+        self.size = size
+        self.dtype = dtype
+        self.coef = np.asarray(taps, dtype=np.float64) if taps is not None else \
+            design(kind, size, cutoff, fs, order, btype)
+        if kind == "fir":
+            self.size = len(self.coef)
+        self.delay = (self.size - 1) / 2 if kind != "iir" else None   # IIR delay is frequency dependent
+        self._ext = np.empty(0)
+        self.reset()
+
+    def reset(self):
+        self._zi = None
+        self._primed = False
+
+    def _prime(self, x0):
+        if self.kind in ("moving_average", "median"):
+            self._tail = np.full(self.size - 1, x0, dtype=np.float64)
+        elif self.kind == "fir":
+            self._zi = signal.lfilter_zi(self.coef, 1.0) * x0
+        else:
+            self._zi = signal.sosfilt_zi(self.coef) * x0
+        self._primed = True
+
+    def process(self, x, out=None):
+        """Filter one chunk into `out` (allocated if None) and return it."""
+        x = np.asarray(x)
+        n = len(x)
+        if out is None:
+            out = np.empty(n, dtype=self.dtype)
+        if n == 0:
+            return out
+        if not self._primed:
+            self._prime(float(x[0]))
+
+        if self.kind == "moving_average":
+            self._moving_average(x, out)
+        elif self.kind == "median":
+            ext = np.concatenate([self._tail, x])
+            np.median(sliding_window_view(ext, self.size), axis=1, out=out)
+            self._tail = ext[n:]
+        elif self.kind == "fir":
+            y, self._zi = signal.lfilter(self.coef, 1.0, x, zi=self._zi)
+            out[:] = y
+        else:
+            y, self._zi = signal.sosfilt(self.coef, x, zi=self._zi)
+            out[:] = y
+        return out
+
+    def _moving_average(self, x, out):
+        k, n = self.size - 1, len(x)
+        if len(self._ext) != k + n:
+            self._ext = np.empty(k + n, dtype=self.dtype)
+            self._smoothed = np.empty(k + n, dtype=self.dtype)
+        ext = self._ext
+        ext[:k] = self._tail
+        ext[k:] = x
+        # origin shifts the running-sum window to end at each sample (causal);
+        # outputs from index k on only see samples of ext, so mode does not matter
+        uniform_filter1d(ext, self.size, output=self._smoothed, origin=k - self.size // 2)
+        out[:] = self._smoothed[k:]
+        self._tail[:] = ext[n:]
@@ -0,0 +1,145 @@
+"""
+Background sweeps for the Streamlit simulators (LAB26-LAB29).
+
+Streamlit runs the script top to bottom on every interaction. A sweep in the
+script body blocks the page, cannot be cancelled and sends a progress
+message for every point. Here the sweep runs in a background thread:
+
+    job = start_sweep(("mc", *params), simulate_level, noise_levels, retry=clicked)
+    points, results = follow(job, render=draw)      # in the script
+
+Jobs are kept by key, so the same parameters give back the running or
+finished sweep instead of starting over (finished results are memoised for
+every session). follow() polls the job from the script, updates the progress
+bar at most every PROGRESS_INTERVAL, redraws the partial results at most
+every RENDER_INTERVAL and shows a Cancel button while the job runs.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+PROGRESS_INTERVAL = 0.25   # s between progress updates sent to the browser
+RENDER_INTERVAL = 1.0      # s between partial-result redraws
+MAX_RUNNING = 2            # sweeps computing at once, across sessions
+CACHE_SIZE = 16            # jobs kept (running ones are never dropped)
+
+
+class SweepJob:
+    """func(point) for each point in order, in a background thread; results grow as a prefix."""
+
+    def __init__(self, func, points):
+        self.func = func
+        self.points = list(points)
+        self.results = []
+        self.error = None
+        self.started = time.monotonic()
+        self.elapsed = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    def run(self):
+        try:
+            for point in self.points:
+                if self._cancel.is_set():
+                    break
+                self.results.append(self.func(point))
+        except Exception as exc:   # re-raised by follow() in the script thread
+            self.error = exc
+        finally:
+            self.elapsed = time.monotonic() - self.started
+            self._done.set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def complete(self):
+        return self.done() and self.error is None and len(self.results) == len(self.points)
+
+    def progress(self):
+        return len(self.results) / max(len(self.points), 1)
+
+    def partial(self):
+        """(points, results) finished so far."""
+        n = len(self.results)
+        return self.points[:n], self.results[:n]
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+
+_jobs = OrderedDict()
+_lock = threading.Lock()
+_executor = None
+
+
+def start_sweep(key, func, points, retry=False):
+    """Job for `key`: the running or finished one if any, else a new one.
+
+    A cancelled or failed job is kept (so its partial result stays on the
+    page) until retry=True, e.g. when the Simulate button is pressed again.
+    """
+    global _executor
+    with _lock:
+        job = _jobs.get(key)
+        if job is not None and not (retry and job.done() and not job.complete()):
+            _jobs.move_to_end(key)
+            return job
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_RUNNING, thread_name_prefix="sweep")
+        job = SweepJob(func, points)
+        _jobs[key] = job
+        _executor.submit(job.run)
+        for old in list(_jobs):
+            if len(_jobs) <= CACHE_SIZE:
+                break
+            if _jobs[old].done():
+                del _jobs[old]
+    return job
+
+
+def follow(job, render=None, label="Simulating", cancel_key="cancel_sweep"):
+    """Show a job's progress in the running Streamlit script until it ends.
+
+    render(points, results) -> matplotlib figure draws the partial results.
+    Returns (points, results) finished so far, all of them unless cancelled.
+    """
+    import matplotlib.pyplot as plt
+    import streamlit as st
+
+    bar = st.progress(job.progress())
+    status = st.empty()
+    chart = st.empty()
+    if not job.done() and st.button("⏹ Cancel", key=cancel_key):
+        job.cancel()
+
+    shown = -1
+    next_render = 0.0
+    while True:
+        finished = job.done()
+        n = len(job.results)
+        bar.progress(job.progress())
+        if not finished:
+            status.text(f"{label}... {n}/{len(job.points)} ({time.monotonic() - job.started:.1f}s)")
+        now = time.monotonic()
+        if render is not None and n and n != shown and (finished or now >= next_render):
+            fig = render(*job.partial())
+            chart.pyplot(fig)
+            plt.close(fig)
+            shown = n
+            next_render = now + RENDER_INTERVAL
+        if finished:
+            break
+        time.sleep(PROGRESS_INTERVAL)
+
+    if job.error is not None:
+        raise job.error
+    if not job.complete():
+        status.text(f"⏹ Cancelled after {len(job.results)}/{len(job.points)} points")
+    else:
+        status.empty()
+    return job.partial()
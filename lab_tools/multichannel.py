@@ -0,0 +1,119 @@
+"""
+N-channel acquisition for scan-mode ADC + DMA streams.
+
+With several channels in the regular sequence (LAB25: NUM_ADC_CHANNELS = 3,
+PA0, PA1, PA2), the DMA buffer holds one sample per channel per conversion
+sequence, so the byte stream is interleaved ch0, ch1, ch2, ch0, ... Here a
+whole burst is converted with a single lookup-table pass, and the channels are
+split as strided views (reshape + transpose, no copy). If a read ends in the
+middle of a conversion sequence, the leftover samples are carried over so the
+channel alignment is never lost (likewise for a read that splits a sample).
+With a reverse=True converter every read is one whole DMA buffer sent back to
+front, so it is handled on its own: an incomplete sequence or byte is dropped
+instead of being carried into the next, unrelated buffer.
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+LAB25_LINE = re.compile(rb"PA(\d+):(\d+)")
+
+
+def deinterleave(samples, n_channels):
+    """(n_channels, n) strided view of an interleaved 1-D array (trailing partial sequence dropped)."""
+    usable = len(samples) // n_channels * n_channels
+    return samples[:usable].reshape(-1, n_channels).T
+
+
+def parse_lab25_line(line):
+    """ADC codes from a LAB25 text line 'PA0:2048 (1.650 V) | PA1:... | PA2:...', in PA order."""
+    pairs = sorted((int(ch), int(code)) for ch, code in LAB25_LINE.findall(line))
+    return [code for _, code in pairs] if pairs else None
+
+
+class ChannelRing:
+    """Per-channel history; latest(n) is a contiguous (channels, n) view (doubled storage)."""
+
+    def __init__(self, n_channels, capacity, dtype=np.float32):
+        self.capacity = capacity
+        self.data = np.zeros((n_channels, 2 * capacity), dtype=dtype)
+        self.pos = 0
+        self.count = 0
+
+    def append(self, block):
+        m = block.shape[1]
+        if m >= self.capacity:
+            block = block[:, -self.capacity:]
+            m = self.capacity
+        first = min(m, self.capacity - self.pos)
+        for offset in (0, self.capacity):
+            self.data[:, self.pos + offset:self.pos + offset + first] = block[:, :first]
+            self.data[:, offset:offset + m - first] = block[:, first:]
+        self.pos = (self.pos + m) % self.capacity
+        self.count += m
+
+    def latest(self, n):
+        n = min(n, self.capacity, self.count)
+        end = self.pos + self.capacity
+        return self.data[:, end - n:end]
+
+
+class MultiChannelAcquisition:
+    """Interleaved DMA bursts -> per-channel float32 volts, plus parallel per-channel analysis.
+
+    push(raw) returns a (channels, samples) array of strided views into one
+    preallocated buffer; it is overwritten by the next push. map() runs a
+    function for every channel on a thread pool (NumPy/SciPy release the GIL
+    in FFT, filtering and reductions), so extra channels use idle cores.
+    """
+
+    def __init__(self, converter, n_channels=1, frame_samples=1024, history=1 << 16, workers=None):
+        self.converter = converter
+        self.n_channels = n_channels
+        self._volts = np.empty(frame_samples * n_channels, dtype=np.float32)
+        self._carry = np.empty(0, dtype=np.uint16)
+        self._odd_byte = b""
+        self.ring = ChannelRing(n_channels, history)
+        self.codes = np.empty((n_channels, 0), dtype=np.uint16)
+        self._per_frame = converter.reverse   # reversed reads don't continue each other
+        workers = n_channels if workers is None else workers
+        self._pool = ThreadPoolExecutor(max_workers=workers) if n_channels > 1 and workers > 1 else None
+
+    def bytes_per_frame(self, frame_samples):
+        return frame_samples * self.n_channels * 2
+
+    def push(self, raw):
+        if self._per_frame:
+            raw = raw[:len(raw) // 2 * 2]
+        elif self._odd_byte or len(raw) % 2:
+            raw = self._odd_byte + bytes(raw)
+            self._odd_byte, raw = raw[len(raw) // 2 * 2:], raw[:len(raw) // 2 * 2]
+        codes = self.converter.codes(raw)
+        if self._per_frame:
+            # a short read lacks the end of the wire, i.e. the start of the reversed buffer
+            codes = codes[len(codes) % self.n_channels:]
+        elif len(self._carry):
+            codes = np.concatenate([self._carry, codes])
+        usable = len(codes) // self.n_channels * self.n_channels
+        if not self._per_frame:
+            self._carry = codes[usable:].copy()
+        if usable > len(self._volts):
+            self._volts = np.empty(usable, dtype=np.float32)
+        volts = self.converter.to_volts(codes[:usable], self._volts[:usable])
+        channels = deinterleave(volts, self.n_channels)
+        self.codes = deinterleave(codes[:usable], self.n_channels)
+        self.ring.append(channels)
+        return channels
+
+    def map(self, func, *per_channel):
+        """[func(ch, *args_for_ch) for every channel], in parallel when there are several."""
+        args = [range(self.n_channels)] + [list(a) for a in per_channel]
+        if self._pool is None:
+            return list(map(func, *args))
+        return list(self._pool.map(func, *args))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
@@ -0,0 +1,105 @@
+"""
+Threaded pipeline pieces: bounded queues that measure themselves, and stages.
+
+A MeteredQueue records how full it is whenever an item goes in and how long
+producers had to wait for room. The wait is the number to watch: a reader
+that waits on a full queue isn't reading the port, so any wait is dead time,
+and a queue that is always near full is feeding a stage that is too slow.
+
+A Stage is a thread that takes items from one queue, calls func(item) and
+puts the result (unless None) on the next one. STOP passed through a queue
+shuts the stages down in order, so everything queued ahead of it is still
+processed.
+"""
+
+import queue
+import threading
+import time
+
+STOP = object()
+
+
+class MeteredQueue(queue.Queue):
+    """Bounded queue.Queue that keeps depth and producer-wait statistics."""
+
+    def __init__(self, maxsize, name="queue"):
+        super().__init__(maxsize)
+        self.name = name
+        self.items = 0
+        self.depth_sum = 0
+        self.max_depth = 0
+        self.wait = 0.0          # s producers spent blocked on a full queue
+        self.max_wait = 0.0
+
+    def put(self, item, block=True, timeout=None):
+        t0 = time.perf_counter()
+        super().put(item, block, timeout)
+        waited = time.perf_counter() - t0
+        if item is STOP:
+            return
+        depth = self.qsize()
+        self.items += 1
+        self.depth_sum += depth
+        self.max_depth = max(self.max_depth, depth)
+        self.wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def snapshot(self):
+        return {
+            "name": self.name,
+            "maxsize": self.maxsize,
+            "depth": self.qsize(),
+            "mean_depth": self.depth_sum / self.items if self.items else 0.0,
+            "max_depth": self.max_depth,
+            "items": self.items,
+            "producer_wait_s": self.wait,
+            "max_wait_s": self.max_wait,
+        }
+
+    def text(self):
+        s = self.snapshot()
+        return (f"{s['name']:>9} depth {s['depth']}/{s['maxsize']}  mean {s['mean_depth']:.2f}  "
+                f"max {s['max_depth']}  wait {s['producer_wait_s'] * 1000:.0f} ms (max {s['max_wait_s'] * 1000:.0f})")
+
+
+class Stage(threading.Thread):
+    """Thread running func(item) for each item of `inbox`, results to `outbox`.
+
+    An exception in func stops the stage; it is kept in `.error` and STOP is
+    still passed on so the stages after it finish.
+    """
+
+    def __init__(self, name, func, inbox, outbox=None):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.busy = 0.0
+        self.done = 0
+        self.error = None
+        self.started_at = None
+
+    def run(self):
+        self.started_at = time.perf_counter()
+        try:
+            while True:
+                item = self.inbox.get()
+                if item is STOP:
+                    break
+                t0 = time.perf_counter()
+                result = self.func(item)
+                self.busy += time.perf_counter() - t0
+                self.done += 1
+                if self.outbox is not None and result is not None:
+                    self.outbox.put(result)
+        except Exception as exc:
+            self.error = exc
+        finally:
+            if self.outbox is not None:
+                self.outbox.put(STOP)
+
+    def utilisation(self):
+        """Share of the stage's lifetime spent in func (near 1 = bottleneck)."""
+        if self.started_at is None:
+            return 0.0
+        return self.busy / max(time.perf_counter() - self.started_at, 1e-9)
@@ -0,0 +1,148 @@
+"""
+Opt-in profiling of FuncAnimation update callbacks.
+
+Enable with the environment variable LAB_PROFILE=1 or the --profile flag on
+the script's command line. When it is off, FrameProfiler.wrap() returns the
+callback unchanged and attach() does nothing, so there is no cost at all.
+
+When on, every frame records the update duration and the canvas draw/blit
+duration, counts frames that overrun the animation interval, and every
+SNAPSHOT_EVERY frames a cProfile snapshot of SNAPSHOT_FRAMES consecutive
+update calls is written to PROFILE_DIR. The per-stage breakdown comes from the
+StreamStats laps the script already records.
+"""
+
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import time
+import numpy as np
+
+ENV_VAR = "LAB_PROFILE"
+CLI_FLAG = "--profile"
+PROFILE_DIR = "profiles"
+SNAPSHOT_EVERY = 300      # frames between cProfile snapshots
+SNAPSHOT_FRAMES = 20      # update calls captured per snapshot
+REPORT_EVERY = 10.0       # s between console reports
+
+
+def profiling_enabled(argv=None):
+    argv = sys.argv if argv is None else argv
+    return CLI_FLAG in argv or os.environ.get(ENV_VAR, "") not in ("", "0")
+
+
+class FrameProfiler:
+    """Per-frame timing, overrun counts and periodic cProfile snapshots."""
+
+    def __init__(self, interval_ms, stats=None, enabled=None, history=1024, name="update"):
+        self.enabled = profiling_enabled() if enabled is None else enabled
+        self.interval = interval_ms / 1000.0
+        self.stats = stats
+        self.name = name
+        self.history = history
+        self._update = np.zeros(history)
+        self._draw = np.zeros(history)
+        self._period = np.zeros(history)
+        self.frames = 0
+        self.overruns = 0
+        self.late_frames = 0
+        self._draw_acc = 0.0
+        self._last_start = None
+        self._profile = None
+        self._next_report = time.monotonic() + REPORT_EVERY
+
+    def wrap(self, update):
+        if not self.enabled:
+            return update
+
+        @functools.wraps(update)
+        def profiled(*args, **kwargs):
+            start = time.perf_counter()
+            if self.frames % SNAPSHOT_EVERY == 0 and self._profile is None:
+                self._profile = cProfile.Profile()
+            if self._profile is not None:
+                self._profile.enable()
+            try:
+                return update(*args, **kwargs)
+            finally:
+                if self._profile is not None:
+                    self._profile.disable()
+                self._record(start, time.perf_counter())
+        return profiled
+
+    def attach(self, fig):
+        """Time fig.canvas.draw and blit (the part FuncAnimation does after update)."""
+        if not self.enabled:
+            return
+        canvas = fig.canvas
+        for method in ("draw", "blit"):
+            original = getattr(canvas, method)
+
+            def timed(*args, _original=original, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return _original(*args, **kwargs)
+                finally:
+                    self._draw_acc += time.perf_counter() - start
+            setattr(canvas, method, timed)
+
+    def _record(self, start, end):
+        i = self.frames % self.history
+        # draw time accumulated since the previous update belongs to the previous frame
+        self._draw[(i - 1) % self.history] = self._draw_acc
+        self._draw_acc = 0.0
+        self._update[i] = end - start
+        self._period[i] = start - self._last_start if self._last_start is not None else self.interval
+        if self._period[i] > 1.5 * self.interval:
+            self.late_frames += 1
+        if self._update[i] + self._draw[(i - 1) % self.history] > self.interval:
+            self.overruns += 1
+        self._last_start = start
+        self.frames += 1
+
+        if self._profile is not None and self.frames % SNAPSHOT_EVERY >= SNAPSHOT_FRAMES:
+            self._save_snapshot()
+        now = time.monotonic()
+        if now >= self._next_report:
+            print(self.report())
+            self._next_report = now + REPORT_EVERY
+
+    def _save_snapshot(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, f"{self.name}_frame{self.frames:06d}")
+        self._profile.dump_stats(base + ".prof")
+        text = io.StringIO()
+        pstats.Stats(self._profile, stream=text).sort_stats("cumulative").print_stats(25)
+        with open(base + ".txt", "w") as f:
+            f.write(text.getvalue())
+        self._profile = None
+
+    def summary(self):
+        n = min(self.frames, self.history)
+        update_ms = self._update[:n] * 1000
+        draw_ms = self._draw[:max(n - 1, 0)] * 1000
+        return {
+            "frames": self.frames,
+            "interval_ms": self.interval * 1000,
+            "update_mean_ms": float(update_ms.mean()) if n else 0.0,
+            "update_p95_ms": float(np.percentile(update_ms, 95)) if n else 0.0,
+            "update_max_ms": float(update_ms.max()) if n else 0.0,
+            "draw_mean_ms": float(draw_ms.mean()) if len(draw_ms) else 0.0,
+            "achieved_fps": float(1.0 / self._period[:n].mean()) if n else 0.0,
+            "overruns": self.overruns,
+            "late_frames": self.late_frames,
+        }
+
+    def report(self):
+        s = self.summary()
+        lines = [f"[profile] {s['frames']} frames @ {s['interval_ms']:.0f} ms: "
+                 f"update {s['update_mean_ms']:.2f} ms (p95 {s['update_p95_ms']:.2f}, max {s['update_max_ms']:.2f}), "
+                 f"draw {s['draw_mean_ms']:.2f} ms, {s['achieved_fps']:.1f} fps, "
+                 f"{s['overruns']} overruns, {s['late_frames']} late"]
+        if self.stats is not None:
+            for name, st in self.stats.snapshot()["stages"].items():
+                lines.append(f"[profile]   {name:>10} {st['mean_ms']:7.2f} ms  p95 {st['p95_ms']:7.2f}  {st['share'] * 100:4.0f}%")
+        return "\n".join(lines)
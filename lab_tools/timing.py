@@ -0,0 +1,162 @@
+"""
+Sample-rate estimation and per-stage latency counters for the capture loops.
+
+Two different rates matter for the STM32 scripts and they are easy to mix up:
+
+* link rate   - samples/bytes per second actually arriving over the UART,
+                measured from arrival times (StreamStats.arrived);
+* ADC rate    - the sample rate *inside* a DMA frame, which is what
+                SAMPLE_RATE must match for every frequency result. It can
+                only be measured against a known test tone
+                (StreamStats.tone_frame / tone_sample_rate).
+
+Stage timings are laps on time.perf_counter_ns() written into preallocated
+ring buffers, so instrumenting a loop costs well under a microsecond per lap.
+"""
+
+import json
+import time
+import numpy as np
+
+STAGES = ("read", "convert", "analyze", "render")
+
+
+def tone_sample_rate(volts, tone_hz):
+    """Sample rate implied by a known tone in `volts` (Hann window, parabolic peak)."""
+    n = len(volts)
+    spectrum = np.abs(np.fft.rfft((volts - np.mean(volts)) * np.hanning(n)))
+    k = int(np.argmax(spectrum[1:])) + 1
+    if 1 <= k < len(spectrum) - 1:
+        a, b, c = np.log(spectrum[k - 1:k + 2] + 1e-12)
+        k = k + 0.5 * (a - c) / (a - 2 * b + c)
+    return tone_hz * n / k
+
+
+class StreamStats:
+    """Arrival-rate, tone-rate and stage-latency bookkeeping for one stream.
+
+    Per frame: start_frame(), then lap(stage) after each stage, and
+    arrived(n_samples, n_bytes) once the frame has been read. Whatever time
+    passes between the last lap and the next start_frame() (canvas draw,
+    plt.pause, idle) is booked as "other".
+    """
+
+    def __init__(self, stages=STAGES, history=256, nominal_rate=None):
+        self.stages = tuple(stages) + ("other",)
+        self.history = history
+        self.nominal_rate = nominal_rate
+        self._index = {s: i for i, s in enumerate(self.stages)}
+        self._laps = np.zeros((len(self.stages), history), dtype=np.int64)   # ns
+        self._frames = 0
+        self._frame_start = None
+        self._last = None
+        self._pending = np.zeros(len(self.stages), dtype=np.int64)
+        self._arrival = np.zeros((history, 3))   # time, samples, bytes
+        self._arrivals = 0
+        self._tone_rates = []
+        self.started = time.monotonic()
+
+    # --- stage latency ---
+    def start_frame(self):
+        now = time.perf_counter_ns()
+        if self._frame_start is not None:
+            self._pending[-1] = now - self._last
+            self._laps[:, self._frames % self.history] = self._pending
+            self._frames += 1
+        self._pending[:] = 0
+        self._frame_start = self._last = now
+
+    def lap(self, stage):
+        now = time.perf_counter_ns()
+        self._pending[self._index[stage]] += now - self._last
+        self._last = now
+
+    # --- rates ---
+    def arrived(self, n_samples, n_bytes):
+        self._arrival[self._arrivals % self.history] = (time.monotonic(), n_samples, n_bytes)
+        self._arrivals += 1
+
+    def link_rate(self):
+        """(samples/s, bytes/s) over the arrival history; NaN until two frames arrived."""
+        n = min(self._arrivals, self.history)
+        if n < 2:
+            return float('nan'), float('nan')
+        order = np.argsort(self._arrival[:n, 0])
+        t, samples, nbytes = self._arrival[order].T
+        span = t[-1] - t[0]
+        if span <= 0:
+            return float('nan'), float('nan')
+        # the first frame's data arrived before its timestamp window opened
+        return samples[1:].sum() / span, nbytes[1:].sum() / span
+
+    def tone_frame(self, volts, tone_hz):
+        """Estimate the ADC sample rate from a frame holding a known test tone."""
+        rate = tone_sample_rate(volts, tone_hz)
+        self._tone_rates = (self._tone_rates + [rate])[-self.history:]
+        return rate
+
+    def adc_rate(self):
+        return float(np.median(self._tone_rates)) if self._tone_rates else float('nan')
+
+    # --- reporting ---
+    def snapshot(self):
+        n = min(self._frames, self.history)
+        laps_ms = self._laps[:, :n] / 1e6
+        frame_ms = laps_ms.sum(axis=0)
+        stages = {}
+        for i, name in enumerate(self.stages):
+            column = laps_ms[i] if n else np.zeros(1)
+            stages[name] = {
+                "mean_ms": float(column.mean()),
+                "p95_ms": float(np.percentile(column, 95)),
+                "max_ms": float(column.max()),
+                "share": float(column.sum() / frame_ms.sum()) if n and frame_ms.sum() > 0 else 0.0,
+            }
+        samples_s, bytes_s = self.link_rate()
+        return {
+            "uptime_s": time.monotonic() - self.started,
+            "frames": self._frames,
+            "frame_ms": float(frame_ms.mean()) if n else float('nan'),
+            "fps": float(1000.0 / frame_ms.mean()) if n and frame_ms.mean() > 0 else float('nan'),
+            "link_samples_per_s": samples_s,
+            "link_bytes_per_s": bytes_s,
+            "adc_rate_tone_hz": self.adc_rate(),
+            "adc_rate_nominal_hz": self.nominal_rate,
+            "stages": stages,
+        }
+
+    def text(self, snapshot=None):
+        """Report of snapshot() (taken now unless one is given, e.g. from another thread)."""
+        s = self.snapshot() if snapshot is None else snapshot
+        lines = [f"{s['fps']:5.1f} fps  {s['frame_ms']:6.1f} ms/frame",
+                 f"link {s['link_samples_per_s'] / 1000:6.2f} kS/s  {s['link_bytes_per_s'] / 1000:6.2f} kB/s"]
+        if not np.isnan(s["adc_rate_tone_hz"]):
+            line = f"ADC fs (tone) {s['adc_rate_tone_hz'] / 1000:.1f} kHz"
+            if self.nominal_rate:
+                line += f" vs {self.nominal_rate / 1000:.1f} set"
+            lines.append(line)
+        for name, st in s["stages"].items():
+            lines.append(f"{name:>9} {st['mean_ms']:6.2f} ms  p95 {st['p95_ms']:6.2f}  {st['share'] * 100:4.0f}%")
+        return "\n".join(lines)
+
+    def dump(self, path, snapshot=None):
+        with open(path, "w") as f:
+            json.dump(self.snapshot() if snapshot is None else snapshot, f, indent=2)
+
+
+class StatsPanel:
+    """Monospace text block on a figure showing StreamStats.text()."""
+
+    def __init__(self, fig, stats, x=0.99, y=0.01, refresh_s=0.5):
+        self.stats = stats
+        self.refresh_s = refresh_s
+        self._next = 0.0
+        self.text = fig.text(x, y, "", ha="right", va="bottom", family="monospace", fontsize=8,
+                             bbox=dict(boxstyle="round", facecolor="white", alpha=0.8))
+
+    def update(self):
+        now = time.monotonic()
+        if now >= self._next:
+            self.text.set_text(self.stats.text())
+            self._next = now + self.refresh_s
+        return self.text
@@ -0,0 +1,145 @@
+"""
+Streaming trigger with hysteresis, holdoff and pre/post-trigger capture.
+
+Works like the trigger block of a bench scope: samples are pushed chunk by
+chunk, the comparator state (with hysteresis) carries over between chunks so
+an edge that straddles two reads is still seen, and every accepted trigger
+yields a window of `pre` samples before and `post` samples after it, taken
+from an internal history buffer once enough samples have arrived.
+
+Modes
+    rising / falling  crossing of `level`
+    window            signal leaves [low, high]
+    pulse             a pulse (positive: rising -> falling) whose width in
+                      samples is within [min_width, max_width]; triggers at
+                      the pulse end
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+Capture = namedtuple("Capture", ["index", "start", "window"])   # absolute trigger / window start, samples
+
+MODES = ("rising", "falling", "window", "pulse")
+
+
+class TriggerEngine:
+    def __init__(self, mode="rising", level=1.65, hysteresis=0.05, low=None, high=None,
+                 min_width=0, max_width=None, polarity="positive",
+                 pre=100, post=300, holdoff=None, dtype=np.float32):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        if mode == "window" and (low is None or high is None):
+            raise ValueError("window mode needs low and high")
+        self.mode = mode
+        self.level = level
+        self.hysteresis = hysteresis
+        self.low, self.high = low, high
+        self.min_width = min_width
+        self.max_width = np.inf if max_width is None else max_width
+        self.polarity = polarity
+        self.pre, self.post = pre, post
+        self.holdoff = post if holdoff is None else holdoff
+        self._buf = np.empty(4 * (pre + post) + 4096, dtype=dtype)
+        self.reset()
+
+    def reset(self):
+        """Forget comparator state, history and pending captures (e.g. after a gap in the stream)."""
+        self._state = {}
+        self._buf_start = self._count = getattr(self, "_count", 0)
+        self._buf_len = 0
+        self._pending = []
+        self._next_allowed = -np.inf
+        self._pulse_start = None
+        self.triggers = getattr(self, "triggers", 0)
+
+    def _schmitt(self, key, x, upper, lower):
+        """Comparator state per sample (+1 high, -1 low, 0 not yet known), prefixed with the carried state."""
+        marks = np.zeros(len(x) + 1, dtype=np.int8)
+        marks[0] = self._state.get(key, 0)
+        marks[1:][x > upper] = 1
+        marks[1:][x < lower] = -1
+        idx = np.where(marks != 0, np.arange(len(marks)), 0)
+        np.maximum.accumulate(idx, out=idx)
+        state = marks[idx]
+        self._state[key] = state[-1]
+        return state
+
+    @staticmethod
+    def _edges(state, rising=True):
+        a, b = (-1, 1) if rising else (1, -1)
+        return np.flatnonzero((state[:-1] == a) & (state[1:] == b))
+
+    def _candidates(self, x):
+        """Chunk-relative indices where the trigger condition occurs."""
+        h = self.hysteresis / 2
+        if self.mode in ("rising", "falling"):
+            state = self._schmitt("level", x, self.level + h, self.level - h)
+            return self._edges(state, self.mode == "rising")
+        if self.mode == "window":
+            above = self._schmitt("high", x, self.high + h, self.high - h)
+            below = self._schmitt("low", x, self.low + h, self.low - h)   # +1 = inside from below
+            outside = np.where((above == 1) | (below == -1), 1, np.where((above == 0) | (below == 0), 0, -1))
+            return self._edges(outside.astype(np.int8), True)
+
+        state = self._schmitt("level", x, self.level + h, self.level - h)
+        positive = self.polarity == "positive"
+        starts = self._edges(state, positive) + self._count
+        ends = self._edges(state, not positive) + self._count
+        if self._pulse_start is not None:
+            starts = np.concatenate([[self._pulse_start], starts])
+        if len(starts):
+            self._pulse_start = starts[-1]
+        k = np.searchsorted(starts, ends, side="left") - 1
+        valid = k >= 0
+        width = ends[valid] - starts[k[valid]]
+        ok = (width >= self.min_width) & (width <= self.max_width)
+        return ends[valid][ok] - self._count
+
+    def _append(self, x):
+        end = self._buf_len + len(x)
+        if end > len(self._buf):
+            # keep what pending captures and the next pre-trigger window can still need
+            keep_from = self._count - self.pre
+            if self._pending:
+                keep_from = min(keep_from, self._pending[0] - self.pre)
+            drop = max(0, min(keep_from - self._buf_start, self._buf_len))
+            self._buf[:self._buf_len - drop] = self._buf[drop:self._buf_len]
+            self._buf_start += drop
+            self._buf_len -= drop
+            end = self._buf_len + len(x)
+            if end > len(self._buf):
+                grown = np.empty(2 * end, dtype=self._buf.dtype)
+                grown[:self._buf_len] = self._buf[:self._buf_len]
+                self._buf = grown
+        self._buf[self._buf_len:end] = x
+        self._buf_len = end
+
+    def push(self, x):
+        """Feed a chunk; returns the list of Captures completed by it."""
+        x = np.asarray(x)
+        self._append(x)
+        for t in self._candidates(x) + self._count:
+            if t >= self._next_allowed:
+                self._pending.append(int(t))
+                self._next_allowed = t + self.holdoff
+                self.triggers += 1
+        self._count += len(x)
+
+        captures = []
+        while self._pending and self._pending[0] + self.post <= self._count:
+            captures.append(self._capture(self._pending.pop(0)))
+        return captures
+
+    def flush(self):
+        """Captures still waiting for post-trigger samples, cut at the newest sample."""
+        captures = [self._capture(t) for t in self._pending]
+        self._pending = []
+        return captures
+
+    def _capture(self, t):
+        start = max(t - self.pre, self._buf_start)
+        a = start - self._buf_start
+        b = min(t + self.post, self._count) - self._buf_start
+        return Capture(t, start, self._buf[a:b].copy())